@@ -45,145 +45,49 @@ WITHDRAWAL_FEE = 0.0  # Комиссию берем на себя (0%)
 STARS_TO_RUB = 1.67  # 1 звезда = 1.67 рубля (примерно)
 MIN_STARS_PURCHASE = 10  # Минимальная покупка звездами
 
+# Настройки базы данных
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # Максимум одновременных соединений с SQLite
+BALANCE_SNAPSHOT_INTERVAL = int(os.getenv("BALANCE_SNAPSHOT_INTERVAL", 3600))  # Секунды между снимками балансов
+
+# Скидки по промокодам, для которых цены считаются заранее при загрузке каталога
+CATALOG_DISCOUNT_TIERS = (0.2,)
+
+# Анимация открытия кейсов: один планировщик на все открытия
+ANIMATION_TICK = float(os.getenv("ANIMATION_TICK", 0.1))  # Шаг тикера, секунды
+ANIMATION_GLOBAL_RATE = float(os.getenv("ANIMATION_GLOBAL_RATE", 25))  # Кадров в секунду на всех (лимит Telegram ~30)
+ANIMATION_CHAT_INTERVAL = float(os.getenv("ANIMATION_CHAT_INTERVAL", 1.0))  # Минимум секунд между кадрами в одном чате
+# classic - текстовые кадры и кубик (~8 запросов к API), media - одна GIF по редкости и одно редактирование
+OPEN_ANIMATION_MODE = os.getenv("OPEN_ANIMATION_MODE", "classic")
+OPEN_ANIMATION_DIR = os.getenv("OPEN_ANIMATION_DIR", "media")  # Файлы open_<редкость>.gif (или .mp4)
+OPEN_ANIMATION_DELAY = float(os.getenv("OPEN_ANIMATION_DELAY", 3))  # Сколько показываем GIF до результата
+
+# Прием апдейтов: при заданном WEBHOOK_URL бот принимает вебхуки, иначе работает через polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", os.getenv("RENDER_EXTERNAL_URL", ""))  # Публичный адрес сервиса
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Пусто - выводится из BOT_TOKEN
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 1000))  # Апдейты в ожидании обработки; сверх - 503 и повтор от Telegram
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 256))  # Сколько апдейтов обрабатываем одновременно (по задаче на апдейт)
+
+# Проверки готовности (/ready): превышение любого порога снимает экземпляр с трафика
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 5))  # Секунды между проверками БД
+HEALTH_MAX_LOOP_LAG_MS = float(os.getenv("HEALTH_MAX_LOOP_LAG_MS", 500))  # Отставание цикла событий
+HEALTH_MAX_DB_RTT_MS = float(os.getenv("HEALTH_MAX_DB_RTT_MS", 1000))  # Время проверочного чтения БД
+HEALTH_MAX_QUEUE_DEPTH = int(os.getenv("HEALTH_MAX_QUEUE_DEPTH", 500))  # Глубина любой из внутренних очередей
+HEALTH_MAX_UPDATE_AGE = float(os.getenv("HEALTH_MAX_UPDATE_AGE", 0))  # Секунды без апдейтов, 0 - не проверять
+
 # Канал для отзывов
 REVIEW_CHANNEL_ID = os.getenv("REVIEW_CHANNEL_ID", "@sharpdrop655")
 
 
-# Можно вынести кейсы в отдельный файл или переменную окружения для гибкости
-def load_cases() -> Dict[int, Dict[str, Any]]:
-    """Загружаем кейсы. В будущем можно вынести в JSON или базу данных."""
-    return {
-        1: {
-            "name": "🟫 Кейс «Новичок»",
-            "price": 19,  # рублей
-            "stars": 10,  # звезд
-            "price_gold": 10,  # GOLD за кейс
-            "items": [
-                {"name": "Glock «Sand»", "rarity": "Common", "chance": 65, "price": 0.07, "emoji": "⚪"},
-                {"name": "USP «Line»", "rarity": "Common", "chance": 22, "price": 0.10, "emoji": "⚪"},
-                {"name": "P350 «Forest»", "rarity": "Uncommon", "chance": 10, "price": 0.25, "emoji": "🔵"},
-                {"name": "MP7 «Urban»", "rarity": "Rare", "chance": 2.8, "price": 1.50, "emoji": "🔷"},
-                {"name": "Fabm «Boom»", "rarity": "Legendary", "chance": 0.2, "price": 150, "emoji": "🟣"}
-            ]
-        },
-        2: {
-            "name": "🟦 Кейс «Городской Штурм»",
-            "price": 45,
-            "stars": 26,
-            "price_gold": 25,
-            "items": [
-                {"name": "Glock «Night»", "rarity": "Common", "chance": 55, "price": 0.12, "emoji": "⚪"},
-                {"name": "MP5 «Urban»", "rarity": "Uncommon", "chance": 25, "price": 0.30, "emoji": "🔵"},
-                {"name": "AKR «Carbon»", "rarity": "Rare", "chance": 15, "price": 1.80, "emoji": "🔷"},
-                {"name": "FAMAS «Beagle»", "rarity": "Epic", "chance": 4.7, "price": 15, "emoji": "🟣"},
-                {"name": "M4A1 «Lizard»", "rarity": "Legendary", "chance": 0.3, "price": 70, "emoji": "🟣"}
-            ]
-        },
-        3: {
-            "name": "🟨 Кейс «Зона Напряжения»",
-            "price": 85,
-            "stars": 50,
-            "price_gold": 50,
-            "items": [
-                {"name": "USP «Stone»", "rarity": "Common", "chance": 48, "price": 0.20, "emoji": "⚪"},
-                {"name": "UMP45 «Urban»", "rarity": "Uncommon", "chance": 27, "price": 0.40, "emoji": "🔵"},
-                {"name": "M4 «Urban»", "rarity": "Rare", "chance": 18, "price": 2.0, "emoji": "🔷"},
-                {"name": "FAMAS «Fury»", "rarity": "Epic", "chance": 6.6, "price": 35, "emoji": "🟣"},
-                {"name": "M4 «Necromancer»", "rarity": "Legendary", "chance": 0.4, "price": 100, "emoji": "🟣"}
-            ]
-        },
-        4: {
-            "name": "⬛ Кейс «Чёрный Рынок»",
-            "price": 150,
-            "stars": 89,
-            "price_gold": 85,
-            "items": [
-                {"name": "Glock «Stone»", "rarity": "Common", "chance": 40, "price": 0.25, "emoji": "⚪"},
-                {"name": "MP7 «Grey»", "rarity": "Uncommon", "chance": 28, "price": 0.50, "emoji": "🔵"},
-                {"name": "AKR «Sandstorm»", "rarity": "Rare", "chance": 22, "price": 3.0, "emoji": "🔷"},
-                {"name": "SM1014 «Blaster»", "rarity": "Epic", "chance": 8.0, "price": 45, "emoji": "🟣"},
-                {"name": "AKR «Necromancer»", "rarity": "Legendary", "chance": 2.0, "price": 200, "emoji": "🟣"}
-            ]
-        },
-        5: {
-            "name": "🌙 Кейс «Полуночный Дозор»",
-            "price": 250,
-            "stars": 149,
-            "price_gold": 140,
-            "items": [
-                {"name": "USP «Night»", "rarity": "Common", "chance": 35, "price": 0.30, "emoji": "⚪"},
-                {"name": "MP5 «Night»", "rarity": "Uncommon", "chance": 30, "price": 0.60, "emoji": "🔵"},
-                {"name": "M4 «Night Wolf»", "rarity": "Rare", "chance": 22, "price": 4.5, "emoji": "🔷"},
-                {"name": "FAMAS «Hull»", "rarity": "Epic", "chance": 11.0, "price": 50, "emoji": "🟣"},
-                {"name": "SM1014 «Necromancer»", "rarity": "Arcane", "chance": 2.0, "price": 500, "emoji": "🔴"}
-            ]
-        },
-        6: {
-            "name": "🕶 Кейс «Секретная Операция»",
-            "price": 380,
-            "stars": 227,
-            "price_gold": 210,
-            "items": [
-                {"name": "MP7 «Thorn»", "rarity": "Uncommon", "chance": 35, "price": 1.0, "emoji": "🔵"},
-                {"name": "AKR «Tiger»", "rarity": "Rare", "chance": 30, "price": 8.0, "emoji": "🔷"},
-                {"name": "M4 «Demon»", "rarity": "Epic", "chance": 20, "price": 65, "emoji": "🟣"},
-                {"name": "P350 «Neon»", "rarity": "Epic", "chance": 11.5, "price": 80, "emoji": "🟣"},
-                {"name": "MAC10 «Argo»", "rarity": "Arcane", "chance": 3.5, "price": 600, "emoji": "🔴"}
-            ]
-        },
-        7: {
-            "name": "👑 Кейс «Элитный Отряд»",
-            "price": 550,
-            "stars": 329,
-            "price_gold": 300,
-            "items": [
-                {"name": "MP5 «Blaze»", "rarity": "Uncommon", "chance": 30, "price": 1.5, "emoji": "🔵"},
-                {"name": "AKR «Hunter»", "rarity": "Rare", "chance": 28, "price": 12, "emoji": "🔷"},
-                {"name": "FAMAS «Anger»", "rarity": "Epic", "chance": 20, "price": 75, "emoji": "🟣"},
-                {"name": "M16 «Winged»", "rarity": "Epic", "chance": 15.0, "price": 90, "emoji": "🟣"},
-                {"name": "MP9 «Hydra»", "rarity": "Arcane", "chance": 7.0, "price": 700, "emoji": "🔴"}
-            ]
-        },
-        8: {
-            "name": "💥 Кейс «Зона Разрушения»",
-            "price": 700,
-            "stars": 419,
-            "price_gold": 380,
-            "items": [
-                {"name": "M4 «Predator»", "rarity": "Rare", "chance": 35, "price": 15, "emoji": "🔷"},
-                {"name": "AKR «Nano»", "rarity": "Epic", "chance": 25, "price": 85, "emoji": "🟣"},
-                {"name": "AWM «Scratch»", "rarity": "Epic", "chance": 25, "price": 95, "emoji": "🟣"},
-                {"name": "UMP45 «Beast»", "rarity": "Arcane", "chance": 12, "price": 700, "emoji": "🔴"},
-                {"name": "Fabm «Thief»", "rarity": "Arcane", "chance": 3, "price": 800, "emoji": "🔴"}
-            ]
-        },
-        9: {
-            "name": "🏆 Кейс «Триумф»",
-            "price": 850,
-            "stars": 509,
-            "price_gold": 460,
-            "items": [
-                {"name": "AKR «Emperor»", "rarity": "Epic", "chance": 40, "price": 100, "emoji": "🟣"},
-                {"name": "M4 «Dragon»", "rarity": "Epic", "chance": 30, "price": 120, "emoji": "🟣"},
-                {"name": "AWP «Gold»", "rarity": "Arcane", "chance": 20, "price": 800, "emoji": "🔴"},
-                {"name": "USP «Royal»", "rarity": "Arcane", "chance": 8, "price": 900, "emoji": "🔴"},
-                {"name": "Karambit «King»", "rarity": "Mythical", "chance": 2, "price": 1500, "emoji": "🟡"}
-            ]
-        },
-        10: {
-            "name": "🌟 Кейс «Абсолют»",
-            "price": 999,
-            "stars": 598,
-            "price_gold": 540,
-            "items": [
-                {"name": "M4 «Godlike»", "rarity": "Arcane", "chance": 35, "price": 850, "emoji": "🔴"},
-                {"name": "AKR «Infinity»", "rarity": "Arcane", "chance": 30, "price": 900, "emoji": "🔴"},
-                {"name": "AWP «Cosmos»", "rarity": "Arcane", "chance": 20, "price": 1000, "emoji": "🔴"},
-                {"name": "Butterfly «Divine»", "rarity": "Mythical", "chance": 10, "price": 1800, "emoji": "🟡"},
-                {"name": "Karambit «Universe»", "rarity": "Mythical", "chance": 5, "price": 2500, "emoji": "🟡"}
-            ]
-        }
-    }
+# Каталог кейсов хранится в JSON, чтобы менять цены и шансы без деплоя
+# (перечитывается командой /reload_cases, см. utils/catalog.py)
+CASES_FILE = os.getenv("CASES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cases.json"))
+
+
+def load_cases(path: str = None) -> Dict[int, Dict[str, Any]]:
+    """Загружаем кейсы из JSON-файла каталога"""
+    with open(path or CASES_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    return {int(case_id): case for case_id, case in data.items()}
 
 
 CASES = load_cases()
@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import DB_POOL_SIZE
+from database.db import Database
+from database.unit_of_work import current_unit_of_work
+from utils.metrics import DB_ERRORS, DB_LATENCY
+
+
+# Один пул потоков на файл БД: все экземпляры AsyncDatabase делят его,
+# поэтому число одновременных запросов к SQLite ограничено DB_POOL_SIZE
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+# Групповой коммит (write-behind очередь, общая транзакция для записей разных
+# апдейтов) сознательно не делаем:
+# - fsync на каждый клик нет и так: в WAL с synchronous = NORMAL (database/pool.py)
+#   COMMIT только дописывает журнал, синхронизация с диском - на контрольной точке;
+# - SQLite пропускает одного писателя за раз, поэтому склеить коммиты единиц
+#   работы можно только через общее соединение, где откат одного апдейта
+#   (ROLLBACK TO его точки сохранения) отменил бы и записи апдейтов, начатых после;
+# - единица работы (UnitOfWork) уже сводит записи апдейта к одному коммиту.
+
+
+def _get_executor(db_path: str, max_workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(db_path)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+            _executors[db_path] = executor
+        return executor
+
+
+class AsyncDatabase:
+    """Асинхронный двойник Database.
+
+    Любой публичный метод Database доступен как корутина:
+    `await db.get_user(telegram_id)`. Запросы выполняются в отдельном пуле
+    потоков, поэтому медленная запись или блокировка БД не останавливает
+    цикл событий aiogram.
+
+    Время каждого вызова (вместе с ожиданием потока) попадает в метрики.
+    """
+
+    def __init__(self, db_path: str = None, max_workers: int = None):
+        self.sync = Database(db_path)
+        self.db_path = self.sync.db_path
+        self.max_workers = max_workers or DB_POOL_SIZE
+        self._executor = _get_executor(self.db_path, self.max_workers)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняем синхронную функцию в пуле потоков БД.
+
+        Внутри единицы работы (UnitOfWork) вызов идет через ее соединение и транзакцию.
+        """
+        uow = current_unit_of_work(self.db_path)
+        if uow is not None:
+            return await uow.execute(func, *args, **kwargs)
+        return await self.run_unbound(func, *args, **kwargs)
+
+    async def run_unbound(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняем функцию в пуле потоков без привязки к единице работы"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.sync, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await self.run(attr, *args, **kwargs)
+            except Exception:
+                DB_ERRORS.inc(method=name)
+                raise
+            finally:
+                DB_LATENCY.observe(time.perf_counter() - started, method=name)
+
+        # Кешируем обертку, чтобы не создавать ее на каждый вызов
+        setattr(self, name, method)
+        return method
+
+    def pending(self) -> int:
+        """Сколько запросов ждут свободного потока"""
+        return self._executor._work_queue.qsize()
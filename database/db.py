@@ -2,9 +2,52 @@ import sqlite3
 import json
 import sqlite3
 import os
-from typing import Optional, List, Dict, Any
+import contextvars
+import functools
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from datetime import datetime
-from config import CASES
+from database.migrations import migrate
+from database.pool import get_pool, SharedConnection
+from database.user_index import get_user_index
+from utils.drop_sampler import get_sampler
+
+
+# Соединение открытой транзакции (единица работы на апдейт):
+# пока оно задано, все методы Database работают через него и не коммитят сами
+_bound_connection: contextvars.ContextVar = contextvars.ContextVar("db_bound_connection", default=None)
+
+# Баланс хранится в целых копейках голды, чтобы суммы в журнале сходились точно
+GOLD_MINOR_UNITS = 100
+
+# Второй счет каждой проводки по причине движения
+LEDGER_COUNTER_ACCOUNTS = {
+    "sale": "house",            # продажа предмета магазину
+    "withdrawal": "payouts",    # заявка на вывод
+    "refund": "payouts",        # возврат отклоненного вывода
+    "adjustment": "adjustments",
+}
+
+
+def to_minor(amount: float) -> int:
+    """Голда -> целые копейки"""
+    return int(round(amount * GOLD_MINOR_UNITS))
+
+
+def encode_inventory_cursor(price: float, name: str, rarity: str) -> str:
+    """Курсор страницы инвентаря: полный ключ последней показанной стопки.
+
+    Стопки уникальны только по (цена, название, редкость) - без редкости
+    стопки с одинаковыми ценой и названием терялись бы на границе страниц.
+    В callback_data курсор не едет - кнопка несет только серверный токен,
+    поэтому название хранится целиком (последним: в нем может быть "|").
+    """
+    return f"{price!r}|{rarity}|{name}"
+
+
+def decode_inventory_cursor(cursor: str) -> Tuple[float, str, str]:
+    price, rarity, name = cursor.split("|", 2)
+    return float(price), name, rarity
 
 
 class Database:
@@ -19,101 +62,92 @@ class Database:
                 db_path = "database.db"
 
         self.db_path = db_path
+        # Пул общий для всех экземпляров Database с одним файлом БД
+        self.pool = get_pool(self.db_path)
+        # Резидентная карта telegram_id -> users.id, тоже общая на файл БД
+        self.user_ids = get_user_index(self.db_path)
         print(f"Используется база данных: {self.db_path}")
         self.init_db()
 
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def init_db(self):
-        """Создаем все таблицы если их нет"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Таблица пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE NOT NULL,
-                username TEXT,
-                full_name TEXT,
-                balance REAL DEFAULT 0.0,
-                reg_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Таблица инвентаря
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                case_id INTEGER NOT NULL,
-                item_name TEXT NOT NULL,
-                item_rarity TEXT NOT NULL,
-                item_price REAL NOT NULL,
-                is_opened BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
+        """Берем соединение из пула; conn.close() возвращает его обратно.
+
+        Внутри bind_connection() возвращается соединение внешней транзакции.
+        """
+        bound = _bound_connection.get()
+        if bound is not None and bound[0] == self.db_path:
+            return SharedConnection(bound[1])
+        return self.pool.acquire()
+
+    @contextmanager
+    def bind_connection(self, conn, after_commit: List[Callable[[], Any]]):
+        """Все вызовы методов внутри блока идут через conn без собственных коммитов.
+
+        Действия, отложенные до коммита (_after_commit), копятся в after_commit:
+        владелец транзакции выполняет их после COMMIT и отбрасывает при откате.
+        """
+        token = _bound_connection.set((self.db_path, conn, after_commit))
+        try:
+            yield conn
+        finally:
+            _bound_connection.reset(token)
 
-        # Таблица заказов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                case_id INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                payment_method TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
+    def ping(self) -> bool:
+        """Проверка доступности БД только на чтение: читаем схему из файла.
 
-        # Таблица выводов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS withdrawals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                game_nickname TEXT NOT NULL,
-                skin_name TEXT NOT NULL,
-                skin_price REAL NOT NULL,
-                screenshot_url TEXT,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
-
-        # Таблица промокодов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS promocodes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT UNIQUE NOT NULL,
-                discount REAL DEFAULT 0.2,
-                used_by TEXT DEFAULT '[]',
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-
-        # Таблица отзывов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reviews (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                rating INTEGER NOT NULL,
-                text TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
+        Блокировку записи не берем: в WAL чтение не ждет пишущую транзакцию,
+        и долгая запись не делает экземпляр неготовым - иначе платформа
+        перезапустила бы живой бот.
+        """
+        conn = self.pool.acquire()
+        try:
+            conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            return True
+        finally:
+            conn.close()
 
-        conn.commit()
-        conn.close()
+    def pool_stats(self) -> Dict:
+        """Статистика пула соединений"""
+        return self.pool.stats()
+
+    def user_index_stats(self) -> Dict:
+        """Статистика индекса telegram_id -> users.id"""
+        return self.user_ids.stats()
+
+    def _after_commit(self, action: Callable[[], Any]):
+        """Выполняем action после фиксации текущей транзакции.
+
+        Вне внешней транзакции метод уже закоммитил сам - выполняем сразу;
+        внутри bind_connection() действие ждет коммита владельца и
+        пропадает при откате.
+        """
+        bound = _bound_connection.get()
+        if bound is not None and bound[0] == self.db_path:
+            bound[2].append(action)
+        else:
+            action()
+
+    def _get_user_id(self, cursor, telegram_id: int) -> Optional[int]:
+        """users.id по telegram_id: сначала резидентный индекс, при промахе - БД"""
+        user_id = self.user_ids.get(telegram_id)
+        if user_id is None:
+            cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
+            row = cursor.fetchone()
+            if row:
+                user_id = row['id']
+                # Строка может быть еще не зафиксированной вставкой этой же транзакции
+                self._after_commit(functools.partial(self.user_ids.add, telegram_id, user_id))
+        return user_id
+
+    def init_db(self, dry_run: bool = False):
+        """Приводим схему к актуальной версии через миграции (database/migrations.py)"""
+        conn = self.get_connection()
+        try:
+            migrate(conn, dry_run=dry_run)
+            if not dry_run and not self.user_ids.warmed:
+                self.user_ids.warm(conn)
+        finally:
+            conn.close()
 
     def add_user(self, telegram_id: int, username: str = None, full_name: str = None):
         """Добавляем пользователя если его нет"""
@@ -125,6 +159,9 @@ class Database:
                 (telegram_id, username, full_name)
             )
             conn.commit()
+            if cursor.rowcount == 1:
+                # При откате внешней транзакции id достанется следующему пользователю
+                self._after_commit(functools.partial(self.user_ids.add, telegram_id, cursor.lastrowid))
         except Exception as e:
             print(f"Ошибка добавления пользователя: {e}")
         finally:
@@ -139,58 +176,225 @@ class Database:
         conn.close()
         return dict(user) if user else None
 
-    def update_balance(self, telegram_id: int, amount: float):
-        """Обновляем баланс пользователя"""
+    # === БАЛАНС ===
+
+    def update_balance(self, telegram_id: int, amount: float, reason: str = "adjustment",
+                       idempotency_key: str = None, ref_id: int = None) -> bool:
+        """Меняем баланс и пишем запись в журнал одной транзакцией.
+
+        Повторный вызов с тем же idempotency_key ничего не меняет и возвращает False.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return False
+
+            if not self._apply_balance(cursor, user_id, to_minor(amount), reason, idempotency_key, ref_id):
+                return False
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _apply_balance(cursor, user_id: int, amount_minor: int, reason: str,
+                       idempotency_key: str = None, ref_id: int = None) -> bool:
+        """Запись в журнал и изменение баланса на курсоре вызывающей транзакции"""
+        counter_account = LEDGER_COUNTER_ACCOUNTS.get(reason, "adjustments")
+
+        # Сначала журнал: при дубле ключа запись не вставится и баланс не тронем
         cursor.execute(
-            "UPDATE users SET balance = balance + ? WHERE telegram_id = ?",
-            (amount, telegram_id)
+            """
+            INSERT OR IGNORE INTO balance_ledger
+                (user_id, amount_minor, balance_after_minor, reason, counter_account, idempotency_key, ref_id)
+            SELECT id, ?, balance_minor + ?, ?, ?, ?, ?
+            FROM users WHERE id = ?
+            """,
+            (amount_minor, amount_minor, reason, counter_account, idempotency_key, ref_id, user_id)
         )
-        conn.commit()
+        if cursor.rowcount != 1:
+            return False
+
+        cursor.execute(
+            "UPDATE users SET balance_minor = balance_minor + ?, balance = (balance_minor + ?) / 100.0 WHERE id = ?",
+            (amount_minor, amount_minor, user_id)
+        )
+        return True
+
+    def get_balance_statement(self, telegram_id: int, since: str = None, until: str = None,
+                              limit: int = 50) -> List[Dict]:
+        """Выписка по балансу за период (новые записи первыми)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
+
+        cursor.execute(
+            """
+            SELECT id, amount_minor, balance_after_minor, reason, counter_account, ref_id, created_at
+            FROM balance_ledger
+            WHERE user_id = ? AND created_at >= ? AND created_at < ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (user_id, since or "0000-01-01", until or "9999-12-31 23:59:59", limit)
+        )
+        entries = [dict(row) for row in cursor.fetchall()]
         conn.close()
+        return entries
+
+    def take_balance_snapshots(self) -> int:
+        """Снимаем остатки пользователей, у которых были движения после прошлого снимка.
+
+        Остаток берется из balance_after_minor последней записи, поэтому
+        стоимость пропорциональна числу новых записей, а не размеру журнала.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(ledger_id), 0) FROM balance_snapshots")
+            watermark = cursor.fetchone()[0]
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO balance_snapshots (user_id, ledger_id, balance_minor)
+                SELECT l.user_id, l.id, l.balance_after_minor
+                FROM balance_ledger l
+                WHERE l.id > ?
+                  AND l.id = (SELECT MAX(id) FROM balance_ledger WHERE user_id = l.user_id)
+                """,
+                (watermark,)
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def reconcile_balance(self, telegram_id: int) -> Optional[Dict]:
+        """Сверяем users.balance_minor с журналом: последний снимок + записи после него"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return None
+
+            cursor.execute(
+                """
+                SELECT ledger_id, balance_minor FROM balance_snapshots
+                WHERE user_id = ? ORDER BY ledger_id DESC LIMIT 1
+                """,
+                (user_id,)
+            )
+            snapshot = cursor.fetchone()
+            ledger_id, snapshot_minor = (snapshot[0], snapshot[1]) if snapshot else (0, 0)
+
+            cursor.execute(
+                "SELECT COALESCE(SUM(amount_minor), 0) FROM balance_ledger WHERE user_id = ? AND id > ?",
+                (user_id, ledger_id)
+            )
+            ledger_minor = snapshot_minor + cursor.fetchone()[0]
+
+            cursor.execute("SELECT balance_minor FROM users WHERE id = ?", (user_id,))
+            balance_minor = cursor.fetchone()[0]
+            return {
+                "balance_minor": balance_minor,
+                "ledger_minor": ledger_minor,
+                "snapshot_ledger_id": ledger_id,
+                "ok": balance_minor == ledger_minor,
+            }
+        finally:
+            conn.close()
 
     # === ИНВЕНТАРЬ ===
 
     def get_inventory(self, telegram_id: int) -> List[Dict]:
-        """Получаем весь инвентарь пользователя (и кейсы и предметы)"""
+        """Получаем весь инвентарь пользователя: сначала кейсы, затем стопки предметов"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
+
         cursor.execute('''
             SELECT i.* FROM inventory i
-            JOIN users u ON i.user_id = u.id
-            WHERE u.telegram_id = ?
+            WHERE i.user_id = ?
             ORDER BY 
                 CASE WHEN i.item_rarity = 'Case' THEN 0 ELSE 1 END,
                 i.created_at DESC
-        ''', (telegram_id,))
-
+        ''', (user_id,))
         items = [dict(row) for row in cursor.fetchall()]
+
+        cursor.execute('''
+            SELECT * FROM inventory_stacks
+            WHERE user_id = ?
+            ORDER BY item_price DESC, item_name
+        ''', (user_id,))
+        items.extend(dict(row) for row in cursor.fetchall())
+
         conn.close()
         return items
 
-    def add_to_inventory(self, telegram_id: int, case_id: int, item: Dict):
-        """Добавляем предмет в инвентарь"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_inventory_page(self, telegram_id: int, rarity: str = None, cursor: str = None,
+                           limit: int = 10) -> Dict[str, Any]:
+        """Страница инвентаря: одинаковые предметы сложены в стопки с количеством.
 
-        # Получаем user_id
-        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
-        if not user:
+        Пагинация по ключу (цена, название, редкость), а не OFFSET: стоимость страницы
+        не зависит от того, сколько страниц уже пролистано. cursor - непрозрачная
+        строка из next_cursor предыдущей страницы. Кейсы возвращаются только на
+        первой странице без фильтра по редкости.
+        """
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        page = {"cases": [], "items": [], "next_cursor": None}
+        try:
+            user_id = self._get_user_id(db_cursor, telegram_id)
+            if user_id is None:
+                return page
+
+            if cursor is None and rarity is None:
+                db_cursor.execute('''
+                    SELECT case_id, COUNT(*) AS quantity, MIN(id) AS id
+                    FROM inventory
+                    WHERE user_id = ? AND item_rarity = 'Case'
+                    GROUP BY case_id
+                    ORDER BY case_id
+                ''', (user_id,))
+                page["cases"] = [dict(row) for row in db_cursor.fetchall()]
+
+            conditions = ["user_id = ?"]
+            params: List[Any] = [user_id]
+            if rarity is not None:
+                conditions.append("item_rarity = ?")
+                params.append(rarity)
+            if cursor is not None:
+                price, name, item_rarity = decode_inventory_cursor(cursor)
+                conditions.append("(item_price < ? OR (item_price = ? AND (item_name, item_rarity) > (?, ?)))")
+                params.extend([price, price, name, item_rarity])
+
+            db_cursor.execute(f'''
+                SELECT id, item_name, item_rarity, item_price, quantity
+                FROM inventory_stacks
+                WHERE {" AND ".join(conditions)}
+                ORDER BY item_price DESC, item_name, item_rarity
+                LIMIT ?
+            ''', (*params, limit + 1))
+            items = [dict(row) for row in db_cursor.fetchall()]
+
+            if len(items) > limit:
+                items = items[:limit]
+                last = items[-1]
+                page["next_cursor"] = encode_inventory_cursor(last["item_price"], last["item_name"], last["item_rarity"])
+            page["items"] = items
+            return page
+        finally:
             conn.close()
-            return False
-
-        cursor.execute(
-            '''INSERT INTO inventory 
-               (user_id, case_id, item_name, item_rarity, item_price) 
-               VALUES (?, ?, ?, ?, ?)''',
-            (user['id'], case_id, item['name'], item['rarity'], item['price'])
-        )
-        conn.commit()
-        conn.close()
-        return True
 
     def mark_item_as_opened(self, item_id: int):
         """Помечаем предмет как открытый"""
@@ -203,15 +407,6 @@ class Database:
         conn.commit()
         conn.close()
 
-    def get_item_by_id(self, item_id: int) -> Optional[Dict]:
-        """Получаем предмет по ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM inventory WHERE id = ?", (item_id,))
-        item = cursor.fetchone()
-        conn.close()
-        return dict(item) if item else None
-
     def remove_from_inventory(self, item_id: int):
         """Удаляем предмет из инвентаря"""
         conn = self.get_connection()
@@ -220,6 +415,210 @@ class Database:
         conn.commit()
         conn.close()
 
+    def get_stack(self, telegram_id: int, stack_id: int) -> Optional[Dict]:
+        """Стопка предметов пользователя по ID; чужая стопка - как несуществующая"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM inventory_stacks
+            WHERE id = ? AND user_id = (SELECT id FROM users WHERE telegram_id = ?)
+        ''', (stack_id, telegram_id))
+        stack = cursor.fetchone()
+        conn.close()
+        return dict(stack) if stack else None
+
+    def remove_from_stack(self, telegram_id: int, stack_id: int, quantity: int = 1) -> bool:
+        """Забираем quantity предметов из стопки пользователя.
+
+        Уменьшение условное (стопка принадлежит пользователю и в ней хватает
+        предметов), поэтому повторный запрос не продаст предмет дважды.
+        Опустевшая стопка удаляется.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE inventory_stacks
+                SET quantity = quantity - ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND quantity >= ?
+                  AND user_id = (SELECT id FROM users WHERE telegram_id = ?)
+                RETURNING quantity
+            ''', (quantity, stack_id, quantity, telegram_id))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            if row[0] == 0:
+                cursor.execute("DELETE FROM inventory_stacks WHERE id = ? AND quantity = 0", (stack_id,))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _stack_filter(user_id: int, rarity: str = None, max_price: float = None) -> Tuple[str, list]:
+        """Условие отбора стопок для массовой продажи"""
+        conditions = ["user_id = ?"]
+        params: List[Any] = [user_id]
+        if rarity is not None:
+            conditions.append("item_rarity = ?")
+            params.append(rarity)
+        if max_price is not None:
+            conditions.append("item_price < ?")
+            params.append(max_price)
+        return " AND ".join(conditions), params
+
+    def get_stacks_value(self, telegram_id: int, rarity: str = None,
+                         max_price: float = None) -> Dict[str, Any]:
+        """Сколько предметов подходит под фильтр и сколько они стоят (один агрегатный запрос)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return {"quantity": 0, "total": 0.0}
+
+            where, params = self._stack_filter(user_id, rarity, max_price)
+            cursor.execute(f'''
+                SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(quantity * item_price), 0)
+                FROM inventory_stacks
+                WHERE {where}
+            ''', params)
+            quantity, total = cursor.fetchone()
+            return {"quantity": quantity, "total": round(total, 2)}
+        finally:
+            conn.close()
+
+    def sell_stacks(self, telegram_id: int, rarity: str = None, max_price: float = None) -> Dict[str, Any]:
+        """Продаем все стопки по редкости и/или дешевле max_price одной транзакцией.
+
+        Стопки удаляются одним DELETE ... RETURNING, и сумма считается ровно
+        по удаленным строкам: предмет, выпавший параллельно, не продастся
+        без оплаты. Баланс пополняется одной записью в журнале.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        result = {"quantity": 0, "total": 0.0}
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return result
+
+            where, params = self._stack_filter(user_id, rarity, max_price)
+            cursor.execute(f"DELETE FROM inventory_stacks WHERE {where} RETURNING quantity, item_price", params)
+            sold = cursor.fetchall()
+            if not sold:
+                return result
+
+            total_minor = sum(quantity * to_minor(price) for quantity, price in sold)
+            self._apply_balance(cursor, user_id, total_minor, "sale")
+            conn.commit()
+
+            result["quantity"] = sum(quantity for quantity, _ in sold)
+            result["total"] = total_minor / GOLD_MINOR_UNITS
+            return result
+        finally:
+            conn.close()
+
+    def _store_won_items(self, cursor, user_id: int, items: List[Dict], ref_id: int = None):
+        """Выигрыш: подходящее под правила автопродажи сразу идет в баланс
+        (одной записью в журнале), остальное - в стопки инвентаря.
+
+        Предметы получают auto_sold=True или stack_id.
+        """
+        cursor.execute("SELECT rarity, max_price FROM auto_sell_rules WHERE user_id = ?", (user_id,))
+        rules = cursor.fetchall()
+
+        kept, sold_minor = [], 0
+        for item in items:
+            item['auto_sold'] = any(
+                rarity in ('', item['rarity']) and (max_price is None or item['price'] < max_price)
+                for rarity, max_price in rules
+            )
+            if item['auto_sold']:
+                sold_minor += to_minor(item['price'])
+            else:
+                kept.append(item)
+
+        if sold_minor:
+            self._apply_balance(cursor, user_id, sold_minor, "sale", ref_id=ref_id)
+        for item, stack_id in zip(kept, self._stack_items(cursor, user_id, kept)):
+            item['stack_id'] = stack_id
+
+    def get_auto_sell_rules(self, telegram_id: int) -> List[Dict]:
+        """Правила автопродажи пользователя"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
+
+        cursor.execute(
+            "SELECT rarity, max_price FROM auto_sell_rules WHERE user_id = ? ORDER BY rarity",
+            (user_id,)
+        )
+        rules = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rules
+
+    def set_auto_sell_rule(self, telegram_id: int, rarity: str = None, max_price: float = None) -> bool:
+        """Автопродажа предметов редкости rarity (None - любой) дешевле max_price (None - любых)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return False
+
+            cursor.execute(
+                '''INSERT INTO auto_sell_rules (user_id, rarity, max_price) VALUES (?, ?, ?)
+                   ON CONFLICT (user_id, rarity) DO UPDATE SET max_price = excluded.max_price''',
+                (user_id, rarity or '', max_price)
+            )
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def delete_auto_sell_rule(self, telegram_id: int, rarity: str = None) -> bool:
+        """Удаляем правило автопродажи для редкости (None - правило для любой редкости)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return False
+
+            cursor.execute(
+                "DELETE FROM auto_sell_rules WHERE user_id = ? AND rarity = ?",
+                (user_id, rarity or '')
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def _stack_items(self, cursor, user_id: int, items: List[Dict]) -> List[int]:
+        """Кладем предметы в стопки пользователя; возвращает ID стопок по порядку items"""
+        counts: Dict[tuple, int] = {}
+        for item in items:
+            key = (item['price'], item['name'], item['rarity'])
+            counts[key] = counts.get(key, 0) + 1
+
+        stack_ids = {}
+        for (price, name, rarity), quantity in counts.items():
+            cursor.execute(
+                '''INSERT INTO inventory_stacks (user_id, item_name, item_rarity, item_price, quantity)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, item_price, item_name, item_rarity)
+                   DO UPDATE SET quantity = quantity + excluded.quantity, updated_at = CURRENT_TIMESTAMP
+                   RETURNING id''',
+                (user_id, name, rarity, price, quantity)
+            )
+            stack_ids[(price, name, rarity)] = cursor.fetchone()[0]
+        return [stack_ids[(item['price'], item['name'], item['rarity'])] for item in items]
+
     # === ЗАКАЗЫ ===
 
     def create_order(self, telegram_id, case_id, amount, payment_method="card"):
@@ -228,15 +627,11 @@ class Database:
         cursor = conn.cursor()
 
         # Получаем user_id пользователя
-        cursor.execute("SELECT id, username FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
-        if not user:
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
             conn.close()
             return None
 
-        user_id = user['id']
-        username = user['username']
-
         # Вставляем заказ со статусом 'pending' - используем правильные названия колонок
         cursor.execute("""
             INSERT INTO orders (user_id, case_id, amount, payment_method, status)
@@ -260,24 +655,6 @@ class Database:
         conn.commit()
         conn.close()
 
-    def get_pending_orders(self) -> List[Dict]:
-        """Получаем заказы ожидающие подтверждения"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT 
-                o.*, 
-                u.telegram_id, 
-                u.username 
-            FROM orders o
-            JOIN users u ON o.user_id = u.id
-            WHERE o.status = 'pending' OR o.status = 'waiting_confirmation'
-            ORDER BY o.created_at DESC
-        ''')
-        orders = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return orders
-
     # === ВЫВОДЫ ===
 
     def create_withdrawal(self, telegram_id: int, amount: float, game_nickname: str,
@@ -286,9 +663,8 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
-        if not user:
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
             conn.close()
             return None
 
@@ -296,23 +672,30 @@ class Database:
             '''INSERT INTO withdrawals 
                (user_id, amount, game_nickname, skin_name, skin_price, screenshot_url)
                VALUES (?, ?, ?, ?, ?, ?)''',
-            (user['id'], amount, game_nickname, skin_name, skin_price, screenshot_url)
+            (user_id, amount, game_nickname, skin_name, skin_price, screenshot_url)
         )
         withdrawal_id = cursor.lastrowid
         conn.commit()
         conn.close()
         return withdrawal_id
 
-    def update_withdrawal_status(self, withdrawal_id: int, status: str):
-        """Обновляем статус вывода"""
+    def update_withdrawal_status(self, withdrawal_id: int, status: str) -> bool:
+        """Закрываем заявку на вывод, только если она еще ожидает решения.
+
+        False - заявки нет или она уже подтверждена/отклонена: повторное
+        решение не должно ни выплатить, ни вернуть голду второй раз.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE withdrawals SET status = ? WHERE id = ?",
-            (status, withdrawal_id)
-        )
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute(
+                "UPDATE withdrawals SET status = ? WHERE id = ? AND status = 'pending'",
+                (status, withdrawal_id)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
 
     def get_pending_withdrawals(self) -> List[Dict]:
         """Получаем выводы ожидающие подтверждения"""
@@ -355,29 +738,19 @@ class Database:
         return dict(promo) if promo else None
 
     def use_promocode(self, code: str, telegram_id: int) -> bool:
-        """Используем промокод"""
+        """Используем промокод (атомарная вставка, повторная активация игнорируется)"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT used_by FROM promocodes WHERE code = ?", (code,))
-        promo = cursor.fetchone()
-        if not promo:
-            conn.close()
-            return False
-
-        used_by = json.loads(promo['used_by'])
-        if str(telegram_id) in used_by:
-            conn.close()
-            return False
+        cursor.execute('''
+            INSERT OR IGNORE INTO promo_redemptions (code, user_id)
+            SELECT code, ? FROM promocodes WHERE code = ?
+        ''', (telegram_id, code))
+        used = cursor.rowcount == 1
 
-        used_by.append(str(telegram_id))
-        cursor.execute(
-            "UPDATE promocodes SET used_by = ? WHERE code = ?",
-            (json.dumps(used_by), code)
-        )
         conn.commit()
         conn.close()
-        return True
+        return used
 
     # === ОТЗЫВЫ ===
 
@@ -386,15 +759,14 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
-        if not user:
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
             conn.close()
             return False
 
         cursor.execute(
             "INSERT INTO reviews (user_id, rating, text) VALUES (?, ?, ?)",
-            (user['id'], rating, text)
+            (user_id, rating, text)
         )
         conn.commit()
         conn.close()
@@ -420,91 +792,157 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
+
         cursor.execute('''
             SELECT i.* FROM inventory i
-            JOIN users u ON i.user_id = u.id
-            WHERE u.telegram_id = ? AND i.item_rarity = 'Case'
+            WHERE i.user_id = ? AND i.item_rarity = 'Case'
             ORDER BY i.created_at DESC
-        ''', (telegram_id,))
+        ''', (user_id,))
 
         cases = [dict(row) for row in cursor.fetchall()]
         conn.close()
         return cases
 
     def get_user_items(self, telegram_id: int) -> List[Dict]:
-        """Получаем предметы пользователя (не кейсы)"""
+        """Получаем стопки предметов пользователя (не кейсы), дорогие сверху"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
+
         cursor.execute('''
-            SELECT i.* FROM inventory i
-            JOIN users u ON i.user_id = u.id
-            WHERE u.telegram_id = ? AND i.item_rarity != 'Case'
-            ORDER BY i.created_at DESC
-        ''', (telegram_id,))
+            SELECT * FROM inventory_stacks
+            WHERE user_id = ?
+            ORDER BY item_price DESC, item_name
+        ''', (user_id,))
 
         items = [dict(row) for row in cursor.fetchall()]
         conn.close()
         return items
 
-    def open_case(self, inventory_id: int, telegram_id: int) -> Dict:
-        """Открываем кейс и получаем случайный предмет"""
+    def open_case(self, inventory_id: int, telegram_id: int, idempotency_key: str = None) -> Optional[Dict]:
+        """Открываем кейс и получаем случайный предмет.
+
+        Кейс забирается условным DELETE (строка есть, это кейс, он принадлежит
+        пользователю), а выигрыш сохраняется в case_openings под ключом
+        идемпотентности (по умолчанию - ID кейса). Повторный вызов с тем же
+        ключом вернет тот же предмет с replayed=True и ничего не начислит.
+        """
+        key = idempotency_key or f"case:{inventory_id}"
+        sampler = get_sampler()
         conn = self.get_connection()
         cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None:
+                return None
 
-        # Получаем информацию о кейсе
-        cursor.execute("SELECT case_id FROM inventory WHERE id = ?", (inventory_id,))
-        case_record = cursor.fetchone()
-        if not case_record:
-            conn.close()
-            return None
+            known_cases = list(sampler.tables)
+            placeholders = ",".join("?" * len(known_cases))
+            cursor.execute(
+                f"""
+                DELETE FROM inventory
+                WHERE id = ? AND user_id = ? AND item_rarity = 'Case' AND case_id IN ({placeholders})
+                RETURNING case_id
+                """,
+                (inventory_id, user_id, *known_cases)
+            )
+            claimed = cursor.fetchone()
+            if claimed is None:
+                # Кейса уже нет: если его открыли с этим ключом - отдаем сохраненный выигрыш
+                cursor.execute("SELECT * FROM case_openings WHERE idempotency_key = ?", (key,))
+                opening = cursor.fetchone()
+                if opening is not None and opening['user_id'] == user_id:
+                    return self._opening_result(opening)
+                return None
+
+            # Выбор предмета за O(1) по таблице, собранной при загрузке каталога
+            won_item = sampler.draw(claimed[0])[0]
+            won_item['case_id'] = claimed[0]
+            self._store_won_items(cursor, user_id, [won_item], ref_id=inventory_id)
 
-        case_id = case_record['case_id']
+            cursor.execute(
+                '''INSERT INTO case_openings
+                   (idempotency_key, user_id, inventory_id, case_id, item_name, item_rarity,
+                    item_price, item_chance, item_emoji, stack_id, auto_sold)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (key, user_id, inventory_id, won_item['case_id'], won_item['name'], won_item['rarity'],
+                 won_item['price'], won_item.get('chance'), won_item.get('emoji'),
+                 won_item.get('stack_id'), won_item['auto_sold'])
+            )
+            conn.commit()
 
-        # Импортируем CASES здесь чтобы избежать циклического импорта
-        from config import CASES
-        case = CASES.get(case_id)
-        if not case:
+            won_item['replayed'] = False
+            return won_item
+        finally:
             conn.close()
-            return None
-
-        # Взвешенный случайный выбор предмета
-        import random
-        items = case["items"]
-        total = sum(item["chance"] for item in items)
-        r = random.uniform(0, total)
-        upto = 0
-        won_item = None
-        for item in items:
-            if upto + item["chance"] >= r:
-                won_item = item.copy()  # Копируем словач чтобы не менять оригинал
-                break
-            upto += item["chance"]
 
-        if not won_item:
-            conn.close()
-            return None
-
-        # Удаляем кейс из инвентаря
-        cursor.execute("DELETE FROM inventory WHERE id = ?", (inventory_id,))
-
-        # Добавляем выигранный предмет
-        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
+    @staticmethod
+    def _opening_result(opening) -> Dict:
+        """Сохраненный результат открытия в том же виде, что и свежий выигрыш"""
+        return {
+            "name": opening['item_name'],
+            "rarity": opening['item_rarity'],
+            "price": opening['item_price'],
+            "chance": opening['item_chance'],
+            "emoji": opening['item_emoji'],
+            "case_id": opening['case_id'],
+            "stack_id": opening['stack_id'],
+            "auto_sold": bool(opening['auto_sold']),
+            "replayed": True,
+        }
+
+    def open_cases(self, telegram_id: int, limit: int = None) -> List[Dict]:
+        """Открываем сразу несколько кейсов (все или limit самых старых) одной транзакцией.
+
+        Кейсы удаляются одним DELETE ... RETURNING, поэтому параллельный вызов
+        не откроет те же кейсы повторно. Возвращает выигранные предметы
+        (проданные по правилам автопродажи помечены auto_sold).
+        """
+        sampler = get_sampler()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            user_id = self._get_user_id(cursor, telegram_id)
+            if user_id is None or not sampler.tables:
+                return []
 
-        if user and won_item:
+            known_cases = list(sampler.tables)
+            placeholders = ",".join("?" * len(known_cases))
             cursor.execute(
-                '''INSERT INTO inventory 
-                   (user_id, case_id, item_name, item_rarity, item_price) 
-                   VALUES (?, ?, ?, ?, ?)''',
-                (user['id'], case_id, won_item['name'], won_item['rarity'], won_item['price'])
+                f"""
+                DELETE FROM inventory WHERE id IN (
+                    SELECT id FROM inventory
+                    WHERE user_id = ? AND item_rarity = 'Case' AND case_id IN ({placeholders})
+                    ORDER BY created_at
+                    LIMIT ?
+                )
+                RETURNING case_id
+                """,
+                (user_id, *known_cases, -1 if limit is None else limit)
             )
+            opened: Dict[int, int] = {}
+            for row in cursor.fetchall():
+                opened[row[0]] = opened.get(row[0], 0) + 1
 
-        conn.commit()
-        conn.close()
-
-        return won_item
+            won_items = []
+            for case_id, count in opened.items():
+                for item in sampler.draw(case_id, count):
+                    item["case_id"] = case_id
+                    won_items.append(item)
 
+            self._store_won_items(cursor, user_id, won_items)
+            conn.commit()
+            return won_items
+        finally:
+            conn.close()
 
     def get_pending_orders(self) -> List[Dict]:
         """Получаем заказы ожидающие подтверждения"""
@@ -522,23 +960,27 @@ class Database:
         return orders
 
     def add_to_inventory(self, telegram_id: int, case_id: int, item: Dict):
-        """Добавляем предмет в инвентарь"""
+        """Добавляем в инвентарь кейс (отдельной строкой) или предмет (в стопку)"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        # Получаем user_id
-        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-        user = cursor.fetchone()
-        if not user:
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
             conn.close()
             return False
 
+        if item['rarity'] != 'Case':
+            self._stack_items(cursor, user_id, [item])
+            conn.commit()
+            conn.close()
+            return True
+
         # Добавляем в инвентарь
         cursor.execute(
             '''INSERT INTO inventory 
                (user_id, case_id, item_name, item_rarity, item_price) 
                VALUES (?, ?, ?, ?, ?)''',
-            (user['id'], case_id, item['name'], item['rarity'], item['price'])
+            (user_id, case_id, item['name'], item['rarity'], item['price'])
         )
         conn.commit()
         conn.close()
@@ -549,11 +991,15 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return False
+
         cursor.execute('''
             SELECT COUNT(*) as count FROM inventory i
-            JOIN users u ON i.user_id = u.id
-            WHERE u.telegram_id = ? AND i.case_id = ? AND i.item_rarity = 'Case'
-        ''', (telegram_id, case_id))
+            WHERE i.user_id = ? AND i.case_id = ? AND i.item_rarity = 'Case'
+        ''', (user_id, case_id))
 
         result = cursor.fetchone()
         conn.close()
@@ -564,11 +1010,15 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return 0
+
         cursor.execute('''
             SELECT COUNT(*) as count FROM inventory i
-            JOIN users u ON i.user_id = u.id
-            WHERE u.telegram_id = ? AND i.item_rarity = 'Case'
-        ''', (telegram_id,))
+            WHERE i.user_id = ? AND i.item_rarity = 'Case'
+        ''', (user_id,))
 
         result = cursor.fetchone()
         conn.close()
@@ -588,11 +1038,15 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return False
+
         cursor.execute('''
             SELECT COUNT(*) as count FROM reviews r
-            JOIN users u ON r.user_id = u.id
-            WHERE u.telegram_id = ?
-        ''', (telegram_id,))
+            WHERE r.user_id = ?
+        ''', (user_id,))
 
         result = cursor.fetchone()
         conn.close()
@@ -603,13 +1057,17 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return None
+
         cursor.execute('''
             SELECT r.* FROM reviews r
-            JOIN users u ON r.user_id = u.id
-            WHERE u.telegram_id = ?
+            WHERE r.user_id = ?
             ORDER BY r.created_at DESC
             LIMIT 1
-        ''', (telegram_id,))
+        ''', (user_id,))
 
         review = cursor.fetchone()
         conn.close()
@@ -620,21 +1078,18 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # CROSS JOIN фиксирует порядок: сначала активации пользователя по индексу,
+        # затем проверка активности кода по уникальному ключу
         cursor.execute('''
-            SELECT used_by FROM promocodes 
-            WHERE is_active = 1
-        ''')
-        all_promos = cursor.fetchall()
-
-        for promo in all_promos:
-            import json
-            used_by = json.loads(promo['used_by'])
-            if str(telegram_id) in used_by:
-                conn.close()
-                return True
+            SELECT 1 FROM promo_redemptions r
+            CROSS JOIN promocodes p ON p.code = r.code
+            WHERE r.user_id = ? AND p.is_active = 1
+            LIMIT 1
+        ''', (telegram_id,))
+        used = cursor.fetchone() is not None
 
         conn.close()
-        return False
+        return used
 
     def has_user_used_this_promo(self, telegram_id: int, promo_code: str) -> bool:
         """Проверяем, использовал ли пользователь КОНКРЕТНЫЙ промокод"""
@@ -642,19 +1097,14 @@ class Database:
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT used_by FROM promocodes 
-            WHERE code = ? AND is_active = 1
-        ''', (promo_code,))
+            SELECT 1 FROM promo_redemptions r
+            JOIN promocodes p ON p.code = r.code
+            WHERE r.code = ? AND r.user_id = ? AND p.is_active = 1
+        ''', (promo_code, telegram_id))
+        used = cursor.fetchone() is not None
 
-        promo = cursor.fetchone()
         conn.close()
-
-        if not promo:
-            return False
-
-        import json
-        used_by = json.loads(promo['used_by'])
-        return str(telegram_id) in used_by
+        return used
 
     def get_all_promocodes(self) -> List[Dict]:
         """Получаем все промокоды"""
@@ -662,8 +1112,10 @@ class Database:
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT * FROM promocodes 
-            ORDER BY is_active DESC, code ASC
+            SELECT p.*,
+                   (SELECT COUNT(*) FROM promo_redemptions r WHERE r.code = p.code) AS uses
+            FROM promocodes p
+            ORDER BY p.is_active DESC, p.code ASC
         ''')
 
         promos = [dict(row) for row in cursor.fetchall()]
@@ -677,6 +1129,7 @@ class Database:
 
         cursor.execute("DELETE FROM promocodes WHERE code = ?", (code,))
         deleted = cursor.rowcount > 0
+        cursor.execute("DELETE FROM promo_redemptions WHERE code = ?", (code,))
 
         conn.commit()
         conn.close()
@@ -711,19 +1164,93 @@ class Database:
         conn.close()
         return dict(withdrawal) if withdrawal else None
 
-    def get_withdrawal_by_id(self, withdrawal_id: int) -> Optional[Dict]:
-        """Получаем вывод по ID"""
+    def get_user_withdrawals(self, telegram_id: int, limit: int = 10) -> List[Dict]:
+        """Получаем последние заявки на вывод пользователя"""
         conn = self.get_connection()
         cursor = conn.cursor()
+
+        user_id = self._get_user_id(cursor, telegram_id)
+        if user_id is None:
+            conn.close()
+            return []
         cursor.execute('''
-            SELECT w.*, u.telegram_id, u.username 
-            FROM withdrawals w
-            JOIN users u ON w.user_id = u.id
-            WHERE w.id = ?
-        ''', (withdrawal_id,))
-        withdrawal = cursor.fetchone()
+            SELECT w.* FROM withdrawals w
+            WHERE w.user_id = ?
+            ORDER BY w.created_at DESC
+            LIMIT ?
+        ''', (user_id, limit))
+        withdrawals = [dict(row) for row in cursor.fetchall()]
         conn.close()
-        return dict(withdrawal) if withdrawal else None
+        return withdrawals
+
+    # === МЕДИА ===
+
+    def get_media_file_id(self, key: str) -> Optional[str]:
+        """file_id ранее загруженного файла или None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_id FROM media_cache WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        conn.close()
+        return row['file_id'] if row else None
+
+    def set_media_file_id(self, key: str, file_id: str):
+        """Запоминаем file_id после первой загрузки файла"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO media_cache (key, file_id) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET file_id = excluded.file_id, updated_at = CURRENT_TIMESTAMP
+            """,
+            (key, file_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def get_recent_users(self, limit: int = 10) -> List[Dict]:
+        """Получаем последних зарегистрированных пользователей"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT username, telegram_id, balance, reg_date FROM users ORDER BY reg_date DESC LIMIT ?",
+            (limit,)
+        )
+        users = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return users
+
+    def get_stats(self) -> Dict:
+        """Общая статистика для админ-панели за одно соединение"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT COUNT(*) FROM users")
+        total_users = cursor.fetchone()[0]
+
+        cursor.execute("SELECT COUNT(*), SUM(amount) FROM orders WHERE status = 'completed'")
+        total_orders, total_revenue = cursor.fetchone()
+
+        cursor.execute("SELECT COUNT(*), SUM(amount) FROM withdrawals WHERE status = 'completed'")
+        total_withdrawals, total_paid_out = cursor.fetchone()
+
+        # Продажи по кейсам одним запросом вместо запроса на каждый кейс
+        cursor.execute('''
+            SELECT case_id, COUNT(*) FROM orders
+            WHERE status = 'completed'
+            GROUP BY case_id
+        ''')
+        case_sales = {row[0]: row[1] for row in cursor.fetchall()}
+
+        conn.close()
+        return {
+            "total_users": total_users,
+            "total_orders": total_orders,
+            "total_revenue": total_revenue or 0,
+            "total_withdrawals": total_withdrawals,
+            "total_paid_out": total_paid_out or 0,
+            "case_sales": case_sales,
+        }
 
     def get_order_by_id(self, order_id):
         """Получить заказ по ID"""
@@ -0,0 +1,401 @@
+import sqlite3
+import sys
+from typing import List, NamedTuple, Tuple
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+# Миграции применяются строго по возрастанию номера и только вперед.
+# Уже выпущенные миграции не редактируем - добавляем новую с номером больше.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", (
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER UNIQUE NOT NULL,
+            username TEXT,
+            full_name TEXT,
+            balance REAL DEFAULT 0.0,
+            reg_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            case_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_rarity TEXT NOT NULL,
+            item_price REAL NOT NULL,
+            is_opened BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            case_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            payment_method TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            game_nickname TEXT NOT NULL,
+            skin_name TEXT NOT NULL,
+            skin_price REAL NOT NULL,
+            screenshot_url TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS promocodes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE NOT NULL,
+            discount REAL DEFAULT 0.2,
+            used_by TEXT DEFAULT '[]',
+            is_active BOOLEAN DEFAULT 1
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL,
+            text TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+    )),
+
+    # Активации промокодов: одна строка на пару (код, пользователь).
+    # user_id хранит Telegram ID, как раньше хранил JSON-список used_by
+    Migration(2, "promo_redemptions", (
+        '''
+        CREATE TABLE IF NOT EXISTS promo_redemptions (
+            code TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            redeemed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (code, user_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_promo_redemptions_user
+        ON promo_redemptions (user_id, code)
+        ''',
+        '''
+        INSERT OR IGNORE INTO promo_redemptions (code, user_id)
+        SELECT p.code, CAST(j.value AS INTEGER)
+        FROM promocodes p, json_each(p.used_by) j
+        WHERE p.used_by IS NOT NULL AND p.used_by NOT IN ('', '[]')
+        ''',
+        '''
+        UPDATE promocodes SET used_by = '[]'
+        WHERE used_by IS NOT NULL AND used_by NOT IN ('', '[]')
+        ''',
+    )),
+
+    # Индексы под горячие запросы Database; планы проверяет database/query_audit.py
+    Migration(3, "hot_query_indexes", (
+        # get_inventory: фильтр по пользователю и сортировка "сначала кейсы"
+        '''
+        CREATE INDEX IF NOT EXISTS idx_inventory_user_sort ON inventory (
+            user_id,
+            (CASE WHEN item_rarity = 'Case' THEN 0 ELSE 1 END),
+            created_at DESC
+        )
+        ''',
+        # get_user_cases, has_case_in_inventory, get_user_case_count
+        '''
+        CREATE INDEX IF NOT EXISTS idx_inventory_user_cases
+        ON inventory (user_id, created_at, case_id) WHERE item_rarity = 'Case'
+        ''',
+        # get_user_items
+        '''
+        CREATE INDEX IF NOT EXISTS idx_inventory_user_items
+        ON inventory (user_id, created_at) WHERE item_rarity != 'Case'
+        ''',
+        # get_pending_orders
+        '''
+        CREATE INDEX IF NOT EXISTS idx_orders_status_created
+        ON orders (status, created_at)
+        ''',
+        # get_stats: выручка и продажи по кейсам читаются только из индекса
+        '''
+        CREATE INDEX IF NOT EXISTS idx_orders_status_case
+        ON orders (status, case_id, amount)
+        ''',
+        # get_pending_withdrawals, get_stats
+        '''
+        CREATE INDEX IF NOT EXISTS idx_withdrawals_status_created
+        ON withdrawals (status, created_at)
+        ''',
+        # get_user_withdrawals
+        '''
+        CREATE INDEX IF NOT EXISTS idx_withdrawals_user_created
+        ON withdrawals (user_id, created_at)
+        ''',
+        # has_user_reviewed, get_user_review
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reviews_user_created
+        ON reviews (user_id, created_at)
+        ''',
+        # get_all_reviews
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reviews_created
+        ON reviews (created_at)
+        ''',
+        # get_recent_users
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_reg_date
+        ON users (reg_date)
+        ''',
+        # get_all_promocodes
+        '''
+        CREATE INDEX IF NOT EXISTS idx_promocodes_active_code
+        ON promocodes (is_active DESC, code)
+        ''',
+    )),
+
+    # Журнал движений баланса в копейках голды (1 голда = 100).
+    # Каждая запись - пара счетов: счет пользователя и counter_account
+    # (house, payouts, ...), поэтому сумма по всем счетам всегда ноль.
+    # users.balance_minor - материализованный остаток, users.balance - его копия в голде
+    Migration(4, "balance_ledger", (
+        '''
+        ALTER TABLE users ADD COLUMN balance_minor INTEGER NOT NULL DEFAULT 0
+        ''',
+        '''
+        UPDATE users SET balance_minor = CAST(ROUND(COALESCE(balance, 0) * 100) AS INTEGER)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount_minor INTEGER NOT NULL,
+            balance_after_minor INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            counter_account TEXT NOT NULL,
+            idempotency_key TEXT UNIQUE,
+            ref_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        # Сверка: записи пользователя после последнего снимка
+        '''
+        CREATE INDEX IF NOT EXISTS idx_balance_ledger_user_id
+        ON balance_ledger (user_id, id)
+        ''',
+        # Выписка пользователя за период
+        '''
+        CREATE INDEX IF NOT EXISTS idx_balance_ledger_user_created
+        ON balance_ledger (user_id, created_at)
+        ''',
+        # Снимок остатка на момент записи журнала ledger_id
+        '''
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            user_id INTEGER NOT NULL,
+            ledger_id INTEGER NOT NULL,
+            balance_minor INTEGER NOT NULL,
+            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, ledger_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_balance_snapshots_ledger
+        ON balance_snapshots (ledger_id)
+        ''',
+        # Входящие остатки: журнал сходится с балансами с первого дня
+        '''
+        INSERT INTO balance_ledger (user_id, amount_minor, balance_after_minor, reason, counter_account, idempotency_key)
+        SELECT id, balance_minor, balance_minor, 'opening', 'opening', 'opening:' || id
+        FROM users WHERE balance_minor != 0
+        ''',
+    )),
+
+    # file_id загруженных в Telegram анимаций: повторные отправки без перезагрузки файла
+    Migration(5, "media_cache", (
+        '''
+        CREATE TABLE IF NOT EXISTS media_cache (
+            key TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        ''',
+    )),
+
+    # Постраничный инвентарь: одинаковые кейсы группируются прямо по индексу.
+    # Предметы переезжают в inventory_stacks со своим индексом (миграция 7)
+    Migration(6, "inventory_stack_indexes", (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_inventory_user_case_stack
+        ON inventory (user_id, case_id) WHERE item_rarity = 'Case'
+        ''',
+    )),
+
+    # Предметы хранятся стопками (пользователь, предмет) -> количество.
+    # В inventory остаются только кейсы: у каждого купленного кейса своя строка
+    Migration(7, "inventory_stacks", (
+        '''
+        CREATE TABLE IF NOT EXISTS inventory_stacks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_rarity TEXT NOT NULL,
+            item_price REAL NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        # Ключ стопки и порядок страниц инвентаря (дорогие сверху)
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_stacks_key
+        ON inventory_stacks (user_id, item_price DESC, item_name, item_rarity)
+        ''',
+        '''
+        INSERT INTO inventory_stacks (user_id, item_name, item_rarity, item_price, quantity)
+        SELECT user_id, item_name, item_rarity, item_price, COUNT(*)
+        FROM inventory
+        WHERE item_rarity != 'Case'
+        GROUP BY user_id, item_price, item_name, item_rarity
+        ''',
+        "DELETE FROM inventory WHERE item_rarity != 'Case'",
+        "DROP INDEX IF EXISTS idx_inventory_user_items",
+    )),
+
+    # Правила автопродажи: rarity = '' - любая редкость, max_price NULL - любая цена
+    Migration(8, "auto_sell_rules", (
+        '''
+        CREATE TABLE IF NOT EXISTS auto_sell_rules (
+            user_id INTEGER NOT NULL,
+            rarity TEXT NOT NULL DEFAULT '',
+            max_price REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, rarity),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+    )),
+
+    # Результаты открытий по ключу идемпотентности: повтор возвращает тот же предмет
+    Migration(9, "case_openings", (
+        '''
+        CREATE TABLE IF NOT EXISTS case_openings (
+            idempotency_key TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            inventory_id INTEGER NOT NULL,
+            case_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            item_rarity TEXT NOT NULL,
+            item_price REAL NOT NULL,
+            item_chance REAL,
+            item_emoji TEXT,
+            stack_id INTEGER,
+            auto_sold BOOLEAN NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+    )),
+]
+
+
+def _ensure_version_table(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 - миграции еще не применялись)"""
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not row:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    """Миграции, которые еще не применены к этой БД"""
+    current = get_schema_version(conn)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version > current]
+
+
+def migrate(conn: sqlite3.Connection, dry_run: bool = False) -> List[Migration]:
+    """Применяем недостающие миграции; каждая выполняется в своей транзакции.
+
+    При dry_run=True ничего не меняем, только печатаем SQL.
+    """
+    if dry_run:
+        pending = pending_migrations(conn)
+        for migration in pending:
+            print(f"-- Миграция {migration.version}: {migration.name}")
+            for statement in migration.statements:
+                print(f"{statement.strip()};")
+        if not pending:
+            print("-- Схема актуальна, миграций нет")
+        return pending
+
+    _ensure_version_table(conn)
+    applied = []
+
+    for migration in pending_migrations(conn):
+        # BEGIN IMMEDIATE сразу берет блокировку записи: если несколько процессов
+        # стартуют одновременно, миграцию применит только первый
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if migration.version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (migration.version, migration.name)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"❌ Ошибка миграции {migration.version} ({migration.name})")
+            raise
+
+        applied.append(migration)
+        print(f"✅ Применена миграция {migration.version}: {migration.name}")
+
+    return applied
+
+
+if __name__ == "__main__":
+    # python -m database.migrations [--dry-run] [путь_к_БД]
+    args = [a for a in sys.argv[1:] if a != "--dry-run"]
+    db_path = args[0] if args else "database.db"
+
+    connection = sqlite3.connect(db_path)
+    try:
+        migrate(connection, dry_run="--dry-run" in sys.argv)
+    finally:
+        connection.close()
@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from config import DB_POOL_SIZE
+
+
+# PRAGMA применяются один раз при создании соединения, а не на каждый запрос
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Все соединения пула заняты дольше допустимого времени ожидания"""
+
+
+class PooledConnection:
+    """Обертка над sqlite3.Connection: close() возвращает соединение в пул"""
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        """Возвращаем соединение в пул вместо закрытия"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+    def __del__(self):
+        # Страховка: если метод забыл вызвать close() (например, из-за исключения),
+        # соединение все равно вернется в пул при сборке мусора
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class SharedConnection:
+    """Соединение, которым владеет внешняя транзакция.
+
+    Методы Database по привычке вызывают commit() и close() - здесь это no-op:
+    фиксирует и возвращает соединение в пул тот, кто открыл транзакцию.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConnectionPool:
+    """Пул долгоживущих соединений SQLite с ограничением размера и проверкой здоровья"""
+
+    def __init__(self, db_path: str, max_size: int = 5, timeout: float = 10.0,
+                 health_check_interval: float = 30.0):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = []  # [(conn, время возврата в пул)]
+        self._size = 0
+        self._cond = threading.Condition()
+
+        # Счетчики
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.discarded = 0
+
+    def _create(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection, idle_since: float) -> bool:
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        self.discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """Берем соединение из пула (или создаем новое, если лимит не достигнут)"""
+        deadline = None
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn, idle_since = self._idle.pop()
+                    if self._is_healthy(conn, idle_since):
+                        self.hits += 1
+                        return PooledConnection(self, conn)
+                    self._size -= 1
+                    self._discard(conn)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    self.misses += 1
+                    break
+
+                # Пул исчерпан - ждем, пока кто-нибудь вернет соединение
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                    self.waits += 1
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Нет свободных соединений с БД (размер пула: {self.max_size})"
+                    )
+                started = now
+                self._cond.wait(remaining)
+                self.wait_time += time.monotonic() - started
+
+        try:
+            return PooledConnection(self, self._create())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        """Возвращаем соединение в пул, откатывая незавершенную транзакцию"""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discard(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Закрываем все свободные соединения"""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики пула: попадания, промахи, ожидания"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "wait_time": round(self.wait_time, 6),
+                "discarded": self.discarded,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, max_size: Optional[int] = None) -> ConnectionPool:
+    """Один пул на файл БД - его разделяют все экземпляры Database в процессе"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path, max_size=max_size or DB_POOL_SIZE)
+            _pools[db_path] = pool
+        return pool
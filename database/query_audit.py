@@ -0,0 +1,174 @@
+import os
+import re
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+from database.db import Database
+from database.pool import get_pool
+
+
+# Сценарий, который вызывает каждый метод Database, работающий с SQL.
+# Новый метод нужно добавить сюда - иначе аудит сообщит о пропуске.
+AUDIT_TG_ID = 100500
+AUDIT_ITEM = {"name": "Glock «Sand»", "rarity": "Common", "price": 0.07}
+AUDIT_CASE = {"name": "Кейс", "rarity": "Case", "price": 0}
+
+AUDIT_CALLS: List[Tuple[str, tuple]] = [
+    ("add_user", (AUDIT_TG_ID, "audit", "Audit User")),
+    ("get_user", (AUDIT_TG_ID,)),
+    ("update_balance", (AUDIT_TG_ID, 1.0)),
+    ("update_balance", (AUDIT_TG_ID, 2.5, "sale", "sale:audit", 1)),
+    ("take_balance_snapshots", ()),
+    ("update_balance", (AUDIT_TG_ID, -0.5, "withdrawal")),
+    ("get_balance_statement", (AUDIT_TG_ID,)),
+    ("reconcile_balance", (AUDIT_TG_ID,)),
+    ("add_to_inventory", (AUDIT_TG_ID, 1, AUDIT_CASE)),
+    ("add_to_inventory", (AUDIT_TG_ID, 1, AUDIT_ITEM)),
+    ("get_inventory", (AUDIT_TG_ID,)),
+    ("get_inventory_page", (AUDIT_TG_ID,)),
+    ("get_inventory_page", (AUDIT_TG_ID, "Common", "0.5|Common|Glock «Sand»")),
+    ("get_user_cases", (AUDIT_TG_ID,)),
+    ("get_user_items", (AUDIT_TG_ID,)),
+    ("has_case_in_inventory", (AUDIT_TG_ID, 1)),
+    ("get_user_case_count", (AUDIT_TG_ID,)),
+    ("get_item_by_id", (1,)),
+    ("get_stack", (AUDIT_TG_ID, 1)),
+    ("mark_item_as_opened", (2,)),
+    ("set_auto_sell_rule", (AUDIT_TG_ID, None, 0.1)),
+    ("set_auto_sell_rule", (AUDIT_TG_ID, "Common")),
+    ("get_auto_sell_rules", (AUDIT_TG_ID,)),
+    ("open_case", (1, AUDIT_TG_ID)),
+    ("open_case", (1, AUDIT_TG_ID)),
+    ("add_to_inventory", (AUDIT_TG_ID, 1, AUDIT_CASE)),
+    ("add_to_inventory", (AUDIT_TG_ID, 2, AUDIT_CASE)),
+    ("open_cases", (AUDIT_TG_ID, 5)),
+    ("delete_auto_sell_rule", (AUDIT_TG_ID, "Common")),
+    ("remove_from_inventory", (2,)),
+    ("remove_from_stack", (AUDIT_TG_ID, 1)),
+    ("remove_from_stack", (AUDIT_TG_ID, 1, 100)),
+    ("get_stacks_value", (AUDIT_TG_ID, "Common")),
+    ("get_stacks_value", (AUDIT_TG_ID, None, 1.0)),
+    ("sell_stacks", (AUDIT_TG_ID, "Common", 1.0)),
+    ("create_order", (AUDIT_TG_ID, 1, 19)),
+    ("update_order_status", (1, "waiting_confirmation")),
+    ("get_pending_orders", ()),
+    ("get_order_by_id", (1,)),
+    ("create_withdrawal", (AUDIT_TG_ID, 20, "nick", "skin", 24)),
+    ("update_withdrawal_status", (1, "completed")),
+    ("get_pending_withdrawals", ()),
+    ("get_withdrawal_by_id", (1,)),
+    ("get_user_withdrawals", (AUDIT_TG_ID,)),
+    ("add_promocode", ("AUDIT",)),
+    ("check_promocode", ("AUDIT",)),
+    ("use_promocode", ("AUDIT", AUDIT_TG_ID)),
+    ("has_user_used_any_promo", (AUDIT_TG_ID,)),
+    ("has_user_used_this_promo", (AUDIT_TG_ID, "AUDIT")),
+    ("get_all_promocodes", ()),
+    ("toggle_promocode", ("AUDIT", False)),
+    ("delete_promocode", ("AUDIT",)),
+    ("add_review", (AUDIT_TG_ID, 5, "Отличный магазин")),
+    ("has_user_reviewed", (AUDIT_TG_ID,)),
+    ("get_user_review", (AUDIT_TG_ID,)),
+    ("get_all_reviews", ()),
+    ("set_media_file_id", ("open_common", "AUDIT_FILE_ID")),
+    ("get_media_file_id", ("open_common",)),
+    ("get_recent_users", ()),
+    ("get_stats", ()),
+]
+
+# Методы Database, которые не выполняют запросов к данным
+NOT_AUDITED = {
+    "get_connection", "pool_stats", "user_index_stats", "init_db",
+    "bind_connection", "ping",
+}
+
+# Осознанные проходы по индексу: (метод, строка плана) -> почему это допустимо.
+# Любой другой SCAN, в том числе USING INDEX / USING COVERING INDEX, - регрессия
+TOLERATED_SCANS = {
+    ("get_all_reviews", "SCAN r USING INDEX idx_reviews_created"): "порядок индекса + LIMIT 10",
+    ("get_recent_users", "SCAN users USING INDEX idx_users_reg_date"): "порядок индекса + LIMIT 10",
+    ("get_all_promocodes", "SCAN p USING INDEX idx_promocodes_active_code"): "админский список всех промокодов",
+    ("get_stats", "SCAN users USING COVERING INDEX idx_users_reg_date"): "COUNT(*) по всей таблице",
+}
+
+_AUDITED_STATEMENT = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH|INSERT\s+.*\bSELECT\b)", re.S | re.I)
+_FULL_SCAN = re.compile(r"^SCAN ")
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def collect_queries(db: Database) -> Dict[str, List[str]]:
+    """Выполняем сценарий и собираем SQL каждого метода (с подставленными параметрами)"""
+    queries: Dict[str, List[str]] = {}
+    current = []
+
+    conn = db.get_connection()
+    conn.set_trace_callback(lambda sql: current.append(sql))
+    conn.close()
+
+    for name, args in AUDIT_CALLS:
+        current.clear()
+        getattr(db, name)(*args)
+        queries.setdefault(name, []).extend(
+            sql for sql in current if _AUDITED_STATEMENT.match(sql)
+        )
+
+    conn = db.get_connection()
+    conn.set_trace_callback(None)
+    conn.close()
+    return queries
+
+
+def audit_query_plans(db: Database) -> List[str]:
+    """Проверяем планы всех запросов: проход таблицы (в том числе по индексу,
+    кроме TOLERATED_SCANS) или временное B-дерево для сортировки считаются регрессией"""
+    problems = []
+
+    public_methods = {
+        name for name in dir(Database)
+        if not name.startswith("_") and callable(getattr(Database, name))
+    }
+    for name in sorted(public_methods - NOT_AUDITED - {n for n, _ in AUDIT_CALLS}):
+        problems.append(f"{name}: метод не покрыт аудитом (добавьте его в AUDIT_CALLS)")
+
+    queries = collect_queries(db)
+    conn = db.get_connection()
+    try:
+        for name, statements in queries.items():
+            for sql in statements:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+                for row in plan:
+                    detail = row["detail"]
+                    if _FULL_SCAN.match(detail) and (name, detail) in TOLERATED_SCANS:
+                        continue
+                    if _FULL_SCAN.match(detail) or "USE TEMP B-TREE" in detail:
+                        problems.append(f"{name}: {detail}\n    {_normalize(sql)}")
+    finally:
+        conn.close()
+
+    return problems
+
+
+def run_audit() -> List[str]:
+    """Прогоняем аудит на временной БД со всеми миграциями"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "audit.db")
+        # Один общий коннект, чтобы trace-callback видел все запросы
+        pool = get_pool(db_path, max_size=1)
+        try:
+            return audit_query_plans(Database(db_path))
+        finally:
+            pool.close_all()
+
+
+if __name__ == "__main__":
+    # python -m database.query_audit - ненулевой код выхода при регрессии планов
+    found = run_audit()
+    for problem in found:
+        print(f"❌ {problem}")
+    if found:
+        sys.exit(1)
+    print("✅ Планы запросов в порядке")
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import functools
+from typing import Any, Callable, Optional
+
+
+# Текущая единица работы (устанавливается middleware на время обработки апдейта)
+_current_uow: contextvars.ContextVar = contextvars.ContextVar("unit_of_work", default=None)
+
+
+def current_unit_of_work(db_path: str) -> Optional["UnitOfWork"]:
+    """Единица работы текущей задачи для этой БД или None.
+
+    Задачи, запущенные из обработчика, наследуют его контекст, но могут
+    пережить апдейт - чужую (возможно, уже завершенную) единицу работы
+    они не используют и работают с БД напрямую.
+    """
+    uow = _current_uow.get()
+    if uow is not None and uow.db.db_path == db_path and uow.owner is asyncio.current_task():
+        return uow
+    return None
+
+
+class UnitOfWork:
+    """Одно соединение и одна транзакция на обработку апдейта.
+
+    Соединение берется из пула при первом запросе к БД и удерживается, пока
+    открыта транзакция; все методы Database работают через него без
+    собственных коммитов. В конце апдейта middleware вызывает commit()
+    или rollback(). Обработчик может зафиксировать изменения раньше
+    (await uow.commit()) - перед долгой анимацией или когда выданное
+    (оплаченный кейс, решение админа) не должно откатиться из-за ошибки
+    отправки сообщения; следующий запрос откроет новую транзакцию.
+
+    Метод Database, упавший на середине, откатывается до точки сохранения
+    перед своим вызовом: даже если обработчик перехватит исключение, его
+    частичные записи не попадут в общий коммит.
+    """
+
+    def __init__(self, db, slots: asyncio.Semaphore):
+        # db - AsyncDatabase; slots ограничивает число одновременно занятых соединений
+        self.db = db
+        self._slots = slots
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self.owner: Optional[asyncio.Task] = None
+        # Действия после коммита (например, обновление индекса пользователей)
+        self._after_commit = []
+
+    @property
+    def active(self) -> bool:
+        return self._conn is not None
+
+    def bind(self) -> contextvars.Token:
+        self.owner = asyncio.current_task()
+        return _current_uow.set(self)
+
+    @staticmethod
+    def unbind(token: contextvars.Token):
+        _current_uow.reset(token)
+
+    async def execute(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняем метод Database на соединении единицы работы"""
+        async with self._lock:
+            if self._conn is None:
+                await self._slots.acquire()
+                try:
+                    self._conn = await self.db.run_unbound(self.db.sync.pool.acquire)
+                except BaseException:
+                    self._slots.release()
+                    raise
+            try:
+                return await self.db.run_unbound(self._bound_call, self._conn, func, args, kwargs)
+            finally:
+                # Пока транзакция не открыта (были только чтения), соединение не держим:
+                # обработчик может долго ждать Telegram, а пул общий
+                if not self._conn.in_transaction:
+                    conn, self._conn = self._conn, None
+                    conn.close()
+                    self._slots.release()
+                    # Без открытой транзакции все прочитанное уже зафиксировано
+                    actions, self._after_commit = self._after_commit, []
+                    for action in actions:
+                        action()
+
+    def _bound_call(self, conn, func: Callable, args: tuple, kwargs: dict) -> Any:
+        # Внутри открытой транзакции - точка сохранения; без нее откат метода
+        # равен откату всего, что он начал
+        nested = conn.in_transaction
+        if nested:
+            conn.execute("SAVEPOINT uow_call")
+        pending = len(self._after_commit)
+        try:
+            with self.db.sync.bind_connection(conn, self._after_commit):
+                result = func(*args, **kwargs)
+        except BaseException:
+            if conn.in_transaction:
+                if nested:
+                    conn.execute("ROLLBACK TO uow_call")
+                    conn.execute("RELEASE uow_call")
+                else:
+                    conn.rollback()
+            del self._after_commit[pending:]
+            raise
+        if nested:
+            conn.execute("RELEASE uow_call")
+        return result
+
+    async def commit(self):
+        """Фиксируем транзакцию и возвращаем соединение в пул"""
+        await self._finish(commit=True)
+
+    async def rollback(self):
+        """Откатываем транзакцию и возвращаем соединение в пул"""
+        await self._finish(commit=False)
+
+    async def _finish(self, commit: bool):
+        async with self._lock:
+            if self._conn is None:
+                return
+            conn, self._conn = self._conn, None
+            actions, self._after_commit = self._after_commit, []
+            try:
+                await self.db.run_unbound(functools.partial(self._end, conn, commit))
+            finally:
+                self._slots.release()
+            if commit:
+                for action in actions:
+                    action()
+
+    @staticmethod
+    def _end(conn, commit: bool):
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            conn.close()
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional
+
+
+class UserIdIndex:
+    """Резидентная карта telegram_id -> users.id.
+
+    Хранится в двух отсортированных массивах int64 (16 байт на пользователя),
+    поэтому миллионы пользователей занимают десятки мегабайт, а не сотни,
+    как словарь Python-объектов. Поиск - бинарный, O(log n).
+    """
+
+    def __init__(self):
+        self._keys = array("q")
+        self._values = array("q")
+        self._lock = threading.Lock()
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+
+    def warm(self, conn: sqlite3.Connection, batch_size: int = 10000):
+        """Загружаем всех пользователей одним проходом по уникальному индексу"""
+        keys = array("q")
+        values = array("q")
+        cursor = conn.execute("SELECT telegram_id, id FROM users ORDER BY telegram_id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for telegram_id, user_id in rows:
+                keys.append(telegram_id)
+                values.append(user_id)
+
+        with self._lock:
+            self._keys = keys
+            self._values = values
+            self.warmed = True
+
+    def get(self, telegram_id: int) -> Optional[int]:
+        """users.id по telegram_id или None, если пользователя нет в индексе"""
+        with self._lock:
+            pos = bisect_left(self._keys, telegram_id)
+            if pos < len(self._keys) and self._keys[pos] == telegram_id:
+                self.hits += 1
+                return self._values[pos]
+            self.misses += 1
+            return None
+
+    def add(self, telegram_id: int, user_id: int):
+        """Добавляем пользователя, сохраняя массивы отсортированными"""
+        with self._lock:
+            pos = bisect_left(self._keys, telegram_id)
+            if pos < len(self._keys) and self._keys[pos] == telegram_id:
+                self._values[pos] = user_id
+                return
+            self._keys.insert(pos, telegram_id)
+            self._values.insert(pos, user_id)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def stats(self) -> Dict[str, float]:
+        """Размер индекса и доля попаданий"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._keys),
+                "memory_bytes": (self._keys.itemsize + self._values.itemsize) * len(self._keys),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_indexes: Dict[str, UserIdIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_user_index(db_path: str) -> UserIdIndex:
+    """Один индекс на файл БД - общий для всех экземпляров Database"""
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is None:
+            index = UserIdIndex()
+            _indexes[db_path] = index
+        return index
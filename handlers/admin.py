@@ -1,4 +1,4 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.handlers import message
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.filters import Command
@@ -6,12 +6,19 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from config import ADMIN_IDS, CASES
+from config import ADMIN_IDS
 from keyboards.buttons import admin_order_menu, admin_withdrawal_menu
-from database.db import Database
+from database.async_db import AsyncDatabase
+from database.unit_of_work import UnitOfWork
+from utils.catalog import get_catalog, reload_catalog
+from keyboards.callback_data import (
+    ADMIN_CONFIRM, ADMIN_REJECT, ADMIN_WITHDRAW_CONFIRM, ADMIN_WITHDRAW_REJECT,
+    ADMIN_DELETE_PROMO, ADMIN_TOGGLE_PROMO
+)
+from utils.callback_router import callbacks
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 class AdminStates(StatesGroup):
@@ -27,8 +34,8 @@ async def admin_panel(message: Message):
         await message.answer("⛔ У вас нет доступа к админ-панели")
         return
 
-    pending_orders = db.get_pending_orders()
-    pending_withdrawals = db.get_pending_withdrawals()
+    pending_orders = await db.get_pending_orders()
+    pending_withdrawals = await db.get_pending_withdrawals()
 
     stats_text = (
         f"👑 <b>Панель администратора</b>\n\n"
@@ -54,15 +61,15 @@ async def admin_panel(message: Message):
     await message.answer(stats_text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(F.data == "admin")
+@router.callback_query(callbacks.exact("admin"))
 async def back_to_admin(callback: CallbackQuery):
     """Возврат в админ-панель"""
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    pending_orders = db.get_pending_orders()
-    pending_withdrawals = db.get_pending_withdrawals()
+    pending_orders = await db.get_pending_orders()
+    pending_withdrawals = await db.get_pending_withdrawals()
 
     stats_text = (
         f"👑 <b>Панель администратора</b>\n\n"
@@ -90,7 +97,7 @@ async def back_to_admin(callback: CallbackQuery):
 
 # ========== ОБРАБОТЧИКИ ОСНОВНЫХ КНОПОК АДМИН-ПАНЕЛИ ==========
 @router.message(Command("orders"))
-@router.callback_query(F.data == "admin_orders")
+@router.callback_query(callbacks.exact("admin_orders"))
 async def show_orders(event: Message | CallbackQuery):
     if isinstance(event, CallbackQuery):
         user_id = event.from_user.id
@@ -106,7 +113,7 @@ async def show_orders(event: Message | CallbackQuery):
             await callback.answer("⛔ Нет доступа")
         return
 
-    orders = db.get_pending_orders()
+    orders = await db.get_pending_orders()
 
     if not orders:
         text = "✅ Нет заказов, ожидающих обработки"
@@ -120,7 +127,7 @@ async def show_orders(event: Message | CallbackQuery):
         return
 
     for order in orders:
-        case = CASES.get(order['case_id'], {})
+        case = get_catalog().get(order['case_id']) or {}
         order_text = (
             f"🛒 <b>Заказ #{order['id']}</b>\n\n"
             f"👤 Пользователь: @{order['username'] or 'без username'}\n"
@@ -146,7 +153,7 @@ async def show_orders(event: Message | CallbackQuery):
 
 
 @router.message(Command("withdrawals"))
-@router.callback_query(F.data == "admin_withdrawals")
+@router.callback_query(callbacks.exact("admin_withdrawals"))
 async def show_withdrawals(event: Message | CallbackQuery):
     if isinstance(event, CallbackQuery):
         user_id = event.from_user.id
@@ -162,7 +169,7 @@ async def show_withdrawals(event: Message | CallbackQuery):
             await callback.answer("⛔ Нет доступа")
         return
 
-    withdrawals = db.get_pending_withdrawals()
+    withdrawals = await db.get_pending_withdrawals()
 
     if not withdrawals:
         text = "✅ Нет заявок на вывод"
@@ -216,7 +223,7 @@ async def show_withdrawals(event: Message | CallbackQuery):
 
 
 @router.message(Command("promocodes"))
-@router.callback_query(F.data == "admin_promocodes")
+@router.callback_query(callbacks.exact("admin_promocodes"))
 async def admin_promocodes(event: Message | CallbackQuery):
     if isinstance(event, CallbackQuery):
         user_id = event.from_user.id
@@ -232,25 +239,19 @@ async def admin_promocodes(event: Message | CallbackQuery):
             await callback.answer("⛔ Нет доступа")
         return
 
-    promocodes = db.get_all_promocodes()
+    promocodes = await db.get_all_promocodes()
 
     if not promocodes:
         text = "📋 <b>Промокоды</b>\n\nНет активных промокодов."
     else:
         text = "📋 <b>Промокоды</b>\n\n"
         for promo in promocodes:
-            try:
-                import json
-                used_by = json.loads(promo.get('used_by', '[]'))
-            except:
-                used_by = []
-
             discount = float(promo.get('discount', 0.2)) * 100
             status = "✅ Активен" if promo.get('is_active', 1) else "❌ Неактивен"
             text += f"🎟 <code>{promo['code']}</code>\n"
             text += f"   Скидка: {discount:.0f}%\n"
             text += f"   Статус: {status}\n"
-            text += f"   Использовали: {len(used_by)} чел.\n"
+            text += f"   Использовали: {promo.get('uses', 0)} чел.\n"
             text += "────────────────────\n"
 
     kb = InlineKeyboardMarkup(
@@ -274,7 +275,7 @@ async def admin_promocodes(event: Message | CallbackQuery):
 
 
 @router.message(Command("stats"))
-@router.callback_query(F.data == "admin_stats")
+@router.callback_query(callbacks.exact("admin_stats"))
 async def show_stats(event: Message | CallbackQuery):
     if isinstance(event, CallbackQuery):
         user_id = event.from_user.id
@@ -288,45 +289,20 @@ async def show_stats(event: Message | CallbackQuery):
             await event.answer("⛔ Нет доступа")
         return
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-
-    cursor.execute("SELECT SUM(amount) FROM orders WHERE status = 'completed'")
-    total_revenue = cursor.fetchone()[0] or 0
-
-    cursor.execute("SELECT COUNT(*) FROM orders WHERE status = 'completed'")
-    total_orders = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM withdrawals WHERE status = 'completed'")
-    total_withdrawals = cursor.fetchone()[0]
-
-    cursor.execute("SELECT SUM(amount) FROM withdrawals WHERE status = 'completed'")
-    total_paid_out = cursor.fetchone()[0] or 0
-
-    conn.close()
+    stats = await db.get_stats()
 
     stats_text = (
         f"📊 <b>Общая статистика</b>\n\n"
-        f"👥 Пользователей: <b>{total_users}</b>\n"
-        f"🛒 Заказов: <b>{total_orders}</b>\n"
-        f"💰 Выручка: <b>{total_revenue:.2f}₽</b>\n"
-        f"📤 Выводов: <b>{total_withdrawals}</b>\n"
-        f"💸 Выплачено: <b>{total_paid_out:.2f} голды</b>\n\n"
+        f"👥 Пользователей: <b>{stats['total_users']}</b>\n"
+        f"🛒 Заказов: <b>{stats['total_orders']}</b>\n"
+        f"💰 Выручка: <b>{stats['total_revenue']:.2f}₽</b>\n"
+        f"📤 Выводов: <b>{stats['total_withdrawals']}</b>\n"
+        f"💸 Выплачено: <b>{stats['total_paid_out']:.2f} голды</b>\n\n"
         f"<b>Кейсы по популярности:</b>\n"
     )
 
-    for case_id, case_data in CASES.items():
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM orders WHERE case_id = ? AND status = 'completed'",
-            (case_id,)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
+    for case_id, case_data in get_catalog().cases.items():
+        count = stats['case_sales'].get(case_id, 0)
 
         if count > 0:
             stats_text += f"• {case_data['name']}: {count} продаж\n"
@@ -342,19 +318,13 @@ async def show_stats(event: Message | CallbackQuery):
 
 
 # ========== ОБРАБОТЧИКИ ДЛЯ КНОПОК В РАЗДЕЛАХ ==========
-@router.callback_query(F.data.startswith("admin_confirm_"))
-async def confirm_order(callback: CallbackQuery):
+@router.callback_query(ADMIN_CONFIRM)
+async def confirm_order(callback: CallbackQuery, uow: UnitOfWork, order_id: int):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    try:
-        order_id = int(callback.data.split("_")[2])
-    except:
-        await callback.answer("❌ Ошибка в данных")
-        return
-
-    orders = db.get_pending_orders()
+    orders = await db.get_pending_orders()
     order = None
     for o in orders:
         if o['id'] == order_id:
@@ -365,11 +335,14 @@ async def confirm_order(callback: CallbackQuery):
         await callback.answer("❌ Заказ не найден")
         return
 
-    db.update_order_status(order_id, "completed")
-    case = CASES.get(order['case_id'], {})
+    await db.update_order_status(order_id, "completed")
+    case = get_catalog().get(order['case_id']) or {}
 
     case_item = {"name": case['name'], "rarity": "Case", "price": 0}
-    db.add_to_inventory(order['telegram_id'], order['case_id'], case_item)
+    await db.add_to_inventory(order['telegram_id'], order['case_id'], case_item)
+
+    # Решение админа фиксируем до уведомлений: ошибка отправки его не откатит
+    await uow.commit()
 
     try:
         await callback.bot.send_message(
@@ -406,19 +379,13 @@ async def confirm_order(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin_reject_"))
-async def reject_order(callback: CallbackQuery):
+@router.callback_query(ADMIN_REJECT)
+async def reject_order(callback: CallbackQuery, uow: UnitOfWork, order_id: int):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    try:
-        order_id = int(callback.data.split("_")[2])
-    except:
-        await callback.answer("❌ Ошибка в данных")
-        return
-
-    orders = db.get_pending_orders()
+    orders = await db.get_pending_orders()
     order = None
     for o in orders:
         if o['id'] == order_id:
@@ -429,7 +396,8 @@ async def reject_order(callback: CallbackQuery):
         await callback.answer("❌ Заказ не найден")
         return
 
-    db.update_order_status(order_id, "rejected")
+    await db.update_order_status(order_id, "rejected")
+    await uow.commit()
 
     try:
         await callback.bot.send_message(
@@ -456,26 +424,24 @@ async def reject_order(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin_withdraw_confirm_"))
-async def confirm_withdrawal(callback: CallbackQuery):
+@router.callback_query(ADMIN_WITHDRAW_CONFIRM)
+async def confirm_withdrawal(callback: CallbackQuery, uow: UnitOfWork, withdrawal_id: int):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    try:
-        withdrawal_id = int(callback.data.split("_")[3])
-    except:
-        await callback.answer("❌ Ошибка в данных")
-        return
-
-    db.update_withdrawal_status(withdrawal_id, "completed")
-
-    withdrawal = db.get_withdrawal_by_id(withdrawal_id)
-
+    withdrawal = await db.get_withdrawal_by_id(withdrawal_id)
     if not withdrawal:
         await callback.answer("❌ Заявка не найдена")
         return
 
+    # Условная смена статуса: отклоненную (с возвратом) или уже
+    # подтвержденную заявку второй раз не подтверждаем и не уведомляем
+    if not await db.update_withdrawal_status(withdrawal_id, "completed"):
+        await callback.answer("❌ Заявка уже обработана")
+        return
+    await uow.commit()
+
     try:
         kb_user = InlineKeyboardMarkup(
             inline_keyboard=[
@@ -510,30 +476,25 @@ async def confirm_withdrawal(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin_withdraw_reject_"))
-async def reject_withdrawal(callback: CallbackQuery):
+@router.callback_query(ADMIN_WITHDRAW_REJECT)
+async def reject_withdrawal(callback: CallbackQuery, uow: UnitOfWork, withdrawal_id: int):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    try:
-        withdrawal_id = int(callback.data.split("_")[3])
-    except:
-        await callback.answer("❌ Ошибка в данных")
-        return
-
-    db.update_withdrawal_status(withdrawal_id, "rejected")
-
-    withdrawals = db.get_pending_withdrawals()
-    withdrawal = None
-    for w in withdrawals:
-        if w['id'] == withdrawal_id:
-            withdrawal = w
-            break
-
+    withdrawal = await db.get_withdrawal_by_id(withdrawal_id)
     if not withdrawal:
         await callback.answer("❌ Заявка не найдена")
         return
+    # Возврат только если именно этот вызов перевел заявку из pending
+    if not await db.update_withdrawal_status(withdrawal_id, "rejected"):
+        await callback.answer("❌ Заявка уже обработана")
+        return
+
+    # Возвращаем списанную при создании заявки голду
+    await db.update_balance(withdrawal['telegram_id'], withdrawal['amount'], reason="refund",
+                            idempotency_key=f"refund:{withdrawal_id}", ref_id=withdrawal_id)
+    await uow.commit()
 
     try:
         await callback.bot.send_message(
@@ -560,7 +521,7 @@ async def reject_withdrawal(callback: CallbackQuery):
 
 
 # ========== ПРОМОКОДЫ (УПРАВЛЕНИЕ) ==========
-@router.callback_query(F.data == "admin_add_promo")
+@router.callback_query(callbacks.exact("admin_add_promo"))
 async def admin_add_promo_start(callback: CallbackQuery, state: FSMContext):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
@@ -591,7 +552,7 @@ async def admin_add_promo_finish(message: Message, state: FSMContext):
         await message.answer("❌ Неверный формат промокода. Используйте заглавные буквы и цифры (минимум 4 символа)")
         return
 
-    db.add_promocode(promo_code)
+    await db.add_promocode(promo_code)
 
     await message.answer(
         f"✅ Промокод <code>{promo_code}</code> добавлен\nСкидка: 20%",
@@ -601,13 +562,13 @@ async def admin_add_promo_finish(message: Message, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(F.data == "admin_delete_promo")
+@router.callback_query(callbacks.exact("admin_delete_promo"))
 async def admin_delete_promo_start(callback: CallbackQuery, state: FSMContext):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    promocodes = db.get_all_promocodes()
+    promocodes = await db.get_all_promocodes()
 
     if not promocodes:
         await callback.answer("❌ Нет промокодов для удаления")
@@ -620,7 +581,7 @@ async def admin_delete_promo_start(callback: CallbackQuery, state: FSMContext):
         kb_buttons.append([
             InlineKeyboardButton(
                 text=f"🗑 {promo['code']}",
-                callback_data=f"admin_delete_promo_{promo['code']}"
+                callback_data=ADMIN_DELETE_PROMO.pack(promo_code=promo['code'])
             )
         ])
 
@@ -634,14 +595,13 @@ async def admin_delete_promo_start(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("admin_delete_promo_"))
-async def admin_delete_promo_execute(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ADMIN_DELETE_PROMO)
+async def admin_delete_promo_execute(callback: CallbackQuery, state: FSMContext, promo_code: str):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    promo_code = callback.data.replace("admin_delete_promo_", "")
-    success = db.delete_promocode(promo_code)
+    success = await db.delete_promocode(promo_code)
 
     if success:
         await callback.message.edit_text(
@@ -657,13 +617,13 @@ async def admin_delete_promo_execute(callback: CallbackQuery, state: FSMContext)
     await state.clear()
 
 
-@router.callback_query(F.data == "admin_activate_promo")
+@router.callback_query(callbacks.exact("admin_activate_promo"))
 async def admin_activate_promo_start(callback: CallbackQuery):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    promocodes = db.get_all_promocodes()
+    promocodes = await db.get_all_promocodes()
     inactive_promos = [p for p in promocodes if not p.get('is_active', 1)]
 
     if not inactive_promos:
@@ -675,7 +635,7 @@ async def admin_activate_promo_start(callback: CallbackQuery):
         kb_buttons.append([
             InlineKeyboardButton(
                 text=f"✅ {promo['code']}",
-                callback_data=f"admin_toggle_promo_{promo['code']}_1"
+                callback_data=ADMIN_TOGGLE_PROMO.pack(promo_code=promo['code'], status=1)
             )
         ])
 
@@ -689,13 +649,13 @@ async def admin_activate_promo_start(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "admin_deactivate_promo")
+@router.callback_query(callbacks.exact("admin_deactivate_promo"))
 async def admin_deactivate_promo_start(callback: CallbackQuery):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    promocodes = db.get_all_promocodes()
+    promocodes = await db.get_all_promocodes()
     active_promos = [p for p in promocodes if p.get('is_active', 1)]
 
     if not active_promos:
@@ -707,7 +667,7 @@ async def admin_deactivate_promo_start(callback: CallbackQuery):
         kb_buttons.append([
             InlineKeyboardButton(
                 text=f"❌ {promo['code']}",
-                callback_data=f"admin_toggle_promo_{promo['code']}_0"
+                callback_data=ADMIN_TOGGLE_PROMO.pack(promo_code=promo['code'], status=0)
             )
         ])
 
@@ -721,25 +681,13 @@ async def admin_deactivate_promo_start(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("admin_toggle_promo_"))
-async def admin_toggle_promo_execute(callback: CallbackQuery):
+@router.callback_query(ADMIN_TOGGLE_PROMO)
+async def admin_toggle_promo_execute(callback: CallbackQuery, promo_code: str, status: int):
     if callback.from_user.id not in ADMIN_IDS:
         await callback.answer("⛔ Нет доступа")
         return
 
-    parts = callback.data.split("_")
-    if len(parts) < 5:
-        await callback.answer("❌ Ошибка в данных")
-        return
-
-    promo_code = parts[3]
-    try:
-        status = int(parts[4])
-    except:
-        await callback.answer("❌ Ошибка в статусе")
-        return
-
-    success = db.toggle_promocode(promo_code, bool(status))
+    success = await db.toggle_promocode(promo_code, bool(status))
 
     if success:
         action = "активирован" if status else "деактивирован"
@@ -754,6 +702,27 @@ async def admin_toggle_promo_execute(callback: CallbackQuery):
         await callback.answer("❌ Промокод не найден")
 
 
+# ========== КАТАЛОГ ==========
+@router.message(Command("reload_cases"))
+async def reload_cases(message: Message):
+    """Перечитываем каталог кейсов из файла без перезапуска бота"""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("⛔ У вас нет доступа к этой команде")
+        return
+
+    try:
+        catalog = reload_catalog()
+    except Exception as e:
+        await message.answer(f"❌ Каталог не обновлен: {e}\n\nРаботает прежняя версия")
+        return
+
+    await message.answer(
+        f"✅ Каталог обновлен\n\n"
+        f"🔢 Версия: {catalog.version}\n"
+        f"🎁 Кейсов: {len(catalog)}"
+    )
+
+
 # ========== ПОЛЬЗОВАТЕЛИ ==========
 @router.message(Command("users"))
 async def show_users(message: Message):
@@ -761,13 +730,7 @@ async def show_users(message: Message):
         await message.answer("⛔ У вас нет доступа к этой команде")
         return
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT username, telegram_id, balance, reg_date FROM users ORDER BY reg_date DESC LIMIT 10"
-    )
-    users = cursor.fetchall()
-    conn.close()
+    users = await db.get_recent_users(10)
 
     users_text = "👥 <b>Последние 10 пользователей:</b>\n\n"
 
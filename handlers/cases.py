@@ -2,12 +2,15 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 
-from config import CASES
 from keyboards.buttons import cases_menu, case_detail_menu
-from database.db import Database
+from database.async_db import AsyncDatabase
+from utils.catalog import get_catalog
+from utils.render_cache import cached_screen
+from keyboards.callback_data import CASE
+from utils.callback_router import callbacks
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 @router.message(F.text == "🎁 Кейсы")
@@ -20,7 +23,7 @@ async def show_cases(message: Message):
     )
 
 
-@router.callback_query(F.data == "cases")
+@router.callback_query(callbacks.exact("cases"))
 async def show_cases_callback(callback: CallbackQuery):
     await callback.message.edit_text(
         "🎮 <b>Выберите кейс:</b>\n\n",
@@ -29,27 +32,22 @@ async def show_cases_callback(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("case_"))
-async def case_detail(callback: CallbackQuery):
-    case_id = int(callback.data.split("_")[1])
-    case = CASES.get(case_id)
-
+@cached_screen("case_detail")
+def case_detail_screen(case_id: int):
+    """Текст и клавиатура описания кейса (None - кейса нет)"""
+    case = get_catalog().get(case_id)
     if not case:
+        return None
+    return case['detail_text'], case_detail_menu(case_id)
+
+
+@router.callback_query(CASE)
+async def case_detail(callback: CallbackQuery, case_id: int):
+    screen = case_detail_screen(case_id)
+
+    if not screen:
         await callback.answer("Кейс не найден")
         return
 
-    # Формируем список предметов
-    items_text = ""
-    for i, item in enumerate(case["items"]):
-        items_text += f"{item['emoji']} {item['chance']}% — {item['name']}\n | {item['rarity']} | ~ {item['price']}G\n"
-        if i < len(case["items"]) - 1:  # Не добавляем разделитель после последнего элемента
-            items_text += "===========================\n"
-
-    await callback.message.edit_text(
-        f"<b>{case['name']}</b>\n\n"
-        f"💰 Цена: <b>{case['price']}₽</b> или <b>{case['stars']} ⭐</b>\n\n"
-        f"📦 <b>Содержимое:</b>\n{items_text}\n"
-        f"Выберите действие:",
-        reply_markup=case_detail_menu(case_id),
-        parse_mode="HTML"
-    )
+    text, kb = screen
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
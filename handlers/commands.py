@@ -1,9 +1,11 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+from utils.callback_router import callbacks
+
 router = Router()
 
 
@@ -53,7 +55,7 @@ async def cmd_help(message: Message):
 
 
 @router.message(Command("menu"))
-@router.callback_query(F.data == "menu")
+@router.callback_query(callbacks.exact("menu"))
 async def menu_handler(event: Message | CallbackQuery):
     """Главное меню"""
     from handlers.start import WELCOME_TEXT
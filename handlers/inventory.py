@@ -1,33 +1,75 @@
-import random
-import asyncio
+from functools import partial
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from config import CASES
-from database.db import Database
+from config import OPEN_ANIMATION_MODE, OPEN_ANIMATION_DELAY
+from database.async_db import AsyncDatabase
+from database.unit_of_work import UnitOfWork
+from keyboards.buttons import yes_no_menu
+from utils.animation import Frame, animations
+from keyboards.callback_data import (
+    AUTO_SELL, BULK_SELL, BULK_SOLD, INVENTORY_PAGE, ITEM, OPEN_CASE, OPEN_CASES, SELL, SELL_WON
+)
+from utils.callback_router import callbacks
+from utils.catalog import get_catalog
+from utils.media_cache import MediaCache, rarity_animation_key
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
+media = MediaCache(db)
+
+# Сколько кейсов открывает кнопка "Открыть N"
+BULK_OPEN_STEP = 10
+# Сколько разных предметов показываем в итоге массового открытия
+BULK_SUMMARY_LINES = 25
+# Сколько стопок предметов на одной странице инвентаря
+INVENTORY_PAGE_SIZE = 10
+# Пороги кнопок "Продать все дешевле N"
+BULK_SELL_THRESHOLDS = (0.5, 1, 5)
 
 
 @router.message(F.text == "🎒 Инвентарь")
-@router.callback_query(F.data == "inventory")
+@router.callback_query(callbacks.exact("inventory"))
 async def show_inventory(event: Message | CallbackQuery):
-    """Показываем инвентарь пользователя"""
+    """Показываем первую страницу инвентаря"""
+    text, kb = await inventory_page_view(event.from_user.id)
+
     if isinstance(event, CallbackQuery):
-        user_id = event.from_user.id
-        message = event.message
-        callback = event
+        await event.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
     else:
-        user_id = event.from_user.id
-        message = event
-        callback = None
+        await event.answer(text, reply_markup=kb, parse_mode="HTML")
+
+
+@router.callback_query(callbacks.exact("none"))
+async def noop_button(callback: CallbackQuery):
+    """Кнопка-надпись ("Инвентарь пуст"): только убираем часики"""
+    await callback.answer()
+
+
+@router.callback_query(INVENTORY_PAGE)
+async def inventory_page_handler(callback: CallbackQuery, rarity: str, cursor: str):
+    """Листаем инвентарь с фильтром по редкости"""
+    try:
+        text, kb = await inventory_page_view(callback.from_user.id, rarity, cursor)
+    except ValueError:
+        await callback.answer("❌ Страница устарела")
+        return
+    await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await callback.answer()
+
 
-    # Получаем инвентарь
-    items = db.get_inventory(user_id)
+async def inventory_page_view(user_id: int, rarity: str = None, cursor: str = None):
+    """Текст и клавиатура одной страницы инвентаря.
 
-    if not items:
+    Одинаковые предметы показываются одной строкой с количеством; страница
+    строится из INVENTORY_PAGE_SIZE стопок, сколько бы предметов ни было.
+    """
+    catalog = get_catalog()
+    page = await db.get_inventory_page(user_id, rarity, cursor, INVENTORY_PAGE_SIZE)
+    cases, items = page['cases'], page['items']
+
+    if not cases and not items and rarity is None and cursor is None:
         text = (
             "🎒 <b>Ваш инвентарь пуст</b>\n\n"
             "Приобретите кейсы в разделе 🎁 Кейсы"
@@ -38,73 +80,103 @@ async def show_inventory(event: Message | CallbackQuery):
                 [InlineKeyboardButton(text="◀️ Назад", callback_data="menu")]
             ]
         )
-    else:
-        # Разделяем кейсы и предметы
-        cases = [item for item in items if item['item_rarity'] == 'Case']
-        other_items = [item for item in items if item['item_rarity'] != 'Case']
-
-        text = "🎒 <b>Ваш инвентарь</b>\n\n"
-
-        if cases:
-            text += "<b>📦 Ваши кейсы:</b>\n"
-            for case in cases:
-                case_data = CASES.get(case['case_id'], {})
-                text += f"• {case_data.get('name', 'Неизвестный кейс')}\n"
-
-        if other_items:
-            text += "\n<b>🎯 Ваши предметы:</b>\n"
-            for item in other_items:
-                text += f"• {item['item_name']} |{item['item_rarity']}| - {item['item_price']}G\n"
-
-        text += "\nВыберите что открыть или продать:"
-
-        # Создаем клавиатуру
-        kb = InlineKeyboardBuilder()
-
-        if cases:
-            for case in cases:
-                case_data = CASES.get(case['case_id'], {})
-                kb.row(InlineKeyboardButton(
-                    text=f"📦 {case_data.get('name', 'Кейс')}",
-                    callback_data=f"open_case_{case['id']}"
+        return text, kb
+
+    text = "🎒 <b>Ваш инвентарь</b>\n\n"
+    kb = InlineKeyboardBuilder()
+
+    if cases:
+        text += "<b>📦 Ваши кейсы:</b>\n"
+        for case in cases:
+            case_data = catalog.get(case['case_id']) or {}
+            text += f"• {case_data.get('name', 'Неизвестный кейс')}{stack_suffix(case)}\n"
+            kb.row(InlineKeyboardButton(
+                text=f"📦 {case_data.get('name', 'Кейс')}{stack_suffix(case)}",
+                callback_data=OPEN_CASE.pack(inventory_id=case['id'])
+            ))
+
+        # Массовое открытие - один результат вместо анимации на каждый кейс
+        total_cases = sum(case['quantity'] for case in cases)
+        if total_cases > 1:
+            bulk_buttons = [InlineKeyboardButton(text=f"🎁 Открыть все ({total_cases})", callback_data=OPEN_CASES.pack())]
+            if total_cases > BULK_OPEN_STEP:
+                bulk_buttons.append(InlineKeyboardButton(
+                    text=f"🎁 Открыть {BULK_OPEN_STEP}", callback_data=OPEN_CASES.pack(limit=BULK_OPEN_STEP)
                 ))
+            kb.row(*bulk_buttons)
+
+    if items:
+        text += "\n<b>🎯 Ваши предметы:</b>\n"
+        for item in items:
+            text += f"• {item['item_name']}{stack_suffix(item)} |{item['item_rarity']}| - {item['item_price']}G\n"
+            kb.row(InlineKeyboardButton(
+                text=f"🎯 {item['item_name']}{stack_suffix(item)} - {item['item_price']}G",
+                callback_data=ITEM.pack(stack_id=item['id'])
+            ))
+    elif rarity is not None:
+        text += f"Нет предметов редкости {rarity}\n"
+
+    text += "\nВыберите что открыть или продать:"
+
+    # Фильтры по редкости
+    filters = [InlineKeyboardButton(text="✅ Все" if rarity is None else "Все", callback_data=INVENTORY_PAGE.pack())]
+    for name in catalog.rarities:
+        filters.append(InlineKeyboardButton(
+            text=f"✅ {name}" if name == rarity else name,
+            callback_data=INVENTORY_PAGE.pack(rarity=name)
+        ))
+    for i in range(0, len(filters), 4):
+        kb.row(*filters[i:i + 4])
+
+    nav = []
+    if cursor is not None:
+        nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data=INVENTORY_PAGE.pack(rarity=rarity)))
+    if page['next_cursor']:
+        nav.append(InlineKeyboardButton(
+            text="Далее ▶️", callback_data=INVENTORY_PAGE.pack(rarity=rarity, cursor=page['next_cursor'])
+        ))
+    if nav:
+        kb.row(*nav)
+
+    kb.row(
+        InlineKeyboardButton(text="💰 Продать оптом", callback_data="bulk_sell"),
+        InlineKeyboardButton(text="♻️ Автопродажа", callback_data="auto_sell")
+    )
+    kb.row(InlineKeyboardButton(text="◀️ Назад", callback_data="menu"))
+    return text, kb.as_markup()
 
-        if other_items:
-            for item in other_items:
-                kb.row(InlineKeyboardButton(
-                    text=f"🎯 {item['item_name']} - {item['item_price']}G",
-                    callback_data=f"item_{item['id']}"
-                ))
 
-        kb.row(InlineKeyboardButton(text="◀️ Назад", callback_data="menu"))
-        kb = kb.as_markup()
+def stack_suffix(stack: dict) -> str:
+    return f" ×{stack['quantity']}" if stack['quantity'] > 1 else ""
 
-    if callback:
-        await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
-    else:
-        await message.answer(text, reply_markup=kb, parse_mode="HTML")
 
-
-@router.callback_query(F.data.startswith("open_case_"))
-async def open_case_handler(callback: CallbackQuery):
+@router.callback_query(OPEN_CASE)
+async def open_case_handler(callback: CallbackQuery, uow: UnitOfWork, inventory_id: int):
     """Открываем кейс с анимацией"""
-    inventory_id = int(callback.data.split("_")[2])
     user_id = callback.from_user.id
 
-    # Проверяем, есть ли такой кейс в инвентаре
-    item = db.get_item_by_id(inventory_id)
-    if not item:
+    # Сразу забираем кейс и разыгрываем предмет; анимация только показывает результат.
+    # Повторное нажатие вернет тот же выигрыш, а не откроет кейс второй раз
+    won_item = await db.open_case(inventory_id, user_id)
+    if not won_item:
         await callback.answer("❌ Кейс не найден в инвентаре")
         return
 
-    if item['item_rarity'] != 'Case':
-        await callback.answer("❌ Это не кейс")
+    if won_item['replayed']:
+        await callback.answer(f"🎁 Кейс уже открыт: {won_item['name']}")
         return
 
+    # Фиксируем выигрыш до анимации
+    await uow.commit()
+
     # Получаем данные кейса
-    case_data = CASES.get(item['case_id'], {})
+    case_data = get_catalog().get(won_item['case_id']) or {}
     case_name = case_data.get('name', 'Неизвестный кейс')
 
+    if OPEN_ANIMATION_MODE == "media":
+        await open_case_with_media(callback, won_item, case_name)
+        return
+
     # Стартовая анимация
     messages = [
         "🎁 <b>Загрузка кейса...</b>\n\n📦 Сканирование содержимого",
@@ -114,40 +186,76 @@ async def open_case_handler(callback: CallbackQuery):
         "💎 <b>Почти готово!</b>\n\n🎉 Приготовьтесь увидеть дроп..."
     ]
 
-    msg = await callback.message.answer(messages[0], parse_mode="HTML")
+    chat_id = callback.message.chat.id
+    bot = callback.message.bot
+    # Сообщения анимации: кадры создают их и ссылаются на уже созданные
+    sent = {}
+
+    async def show(text: str, **kwargs):
+        # Первый дошедший кадр отправляет сообщение, остальные его редактируют
+        if "msg" not in sent:
+            sent["msg"] = await callback.message.answer(text, parse_mode="HTML", **kwargs)
+        else:
+            await sent["msg"].edit_text(text, parse_mode="HTML", **kwargs)
+
+    async def roll_dice():
+        sent["dice"] = await bot.send_dice(chat_id=chat_id, emoji="🎲")
+
+    async def remove_dice():
+        if "dice" in sent:
+            await bot.delete_message(chat_id=chat_id, message_id=sent["dice"].message_id)
+
+    # Кадры раз в секунду, затем кубик (нарды) и 4 секунды, пока он катится.
+    # Все запросы, включая первое сообщение, удаление кубика и итог, отправляет
+    # общий планировщик с учетом лимитов Telegram
+    text, kb = won_item_view(won_item, case_name)
+    dice_at = len(messages)
+    frames = [Frame(second, partial(show, frame_text)) for second, frame_text in enumerate(messages)]
+    frames += [
+        Frame(dice_at, roll_dice, droppable=False),
+        # Итог раньше удаления кубика: лимит чата не откладывает выигрыш
+        Frame(dice_at + 4, partial(show, text, reply_markup=kb), droppable=False),
+        Frame(dice_at + 4, remove_dice, droppable=False),
+    ]
+    await animations.play(chat_id, frames)
 
-    # Продолжаем остальную анимацию
-    for text in messages[1:]:
-        await asyncio.sleep(1)
-        await msg.edit_text(text, parse_mode="HTML")
 
-    await asyncio.sleep(1)
+async def open_case_with_media(callback: CallbackQuery, won_item: dict, case_name: str):
+    """Дешевый режим: одна GIF по редкости выигрыша и одно редактирование подписи"""
+    text, kb = won_item_view(won_item, case_name)
+    key = rarity_animation_key(won_item['rarity'])
+    if not await media.has_animation(key):
+        await callback.message.answer(text, reply_markup=kb, parse_mode="HTML")
+        return
 
-    # Анимация кубика (нард)
-    dice_message = await callback.message.bot.send_dice(
-        chat_id=callback.message.chat.id,
-        emoji="🎲"
-    )
+    chat_id = callback.message.chat.id
+    sent = {}
 
-    # Ждем пока кубик остановится
-    await asyncio.sleep(4)
+    async def start():
+        sent["msg"] = await media.send_animation(
+            callback.message.bot,
+            chat_id,
+            key,
+            caption=f"🎁 <b>Открываем {case_name}...</b>",
+            parse_mode="HTML"
+        )
 
-    # Открываем кейс после анимации кубика
-    won_item = db.open_case(inventory_id, user_id)
+    async def reveal():
+        # GIF не отправилась - показываем выигрыш обычным сообщением
+        if "msg" not in sent:
+            await callback.message.answer(text, reply_markup=kb, parse_mode="HTML")
+        else:
+            await sent["msg"].edit_caption(caption=text, reply_markup=kb, parse_mode="HTML")
 
-    if not won_item:
-        await msg.edit_text("❌ Ошибка при открытии кейса")
-        return
+    # Оба запроса идут через планировщик и его лимиты
+    await animations.play(chat_id, [
+        Frame(0, start, droppable=False),
+        Frame(OPEN_ANIMATION_DELAY, reveal, droppable=False),
+    ])
 
-    # Удаляем сообщение с кубиком
-    try:
-        await callback.message.bot.delete_message(
-            chat_id=callback.message.chat.id,
-            message_id=dice_message.message_id
-        )
-    except:
-        pass
 
+def won_item_view(won_item: dict, case_name: str):
+    """Текст и клавиатура с выигранным предметом"""
     # Определяем эмодзи для редкости
     rarity_emojis = {
         "Common": "⚪",
@@ -161,36 +269,89 @@ async def open_case_handler(callback: CallbackQuery):
     emoji = rarity_emojis.get(won_item['rarity'], "⚪")
 
     # Создаем клавиатуру для действий
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="💰 Продать", callback_data=f"sell_won_{won_item['price']}_{inventory_id}"),
-                InlineKeyboardButton(text="💾 Оставить", callback_data="inventory")
-            ],
-            [InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory")]
-        ]
-    )
+    if won_item.get('auto_sold'):
+        kb = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory")]
+            ]
+        )
+    else:
+        kb = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(text="💰 Продать", callback_data=SELL_WON.pack(stack_id=won_item['stack_id'])),
+                    InlineKeyboardButton(text="💾 Оставить", callback_data="inventory")
+                ],
+                [InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory")]
+            ]
+        )
 
-    await msg.edit_text(
+    text = (
         f"🎉 <b>Поздравляем!</b>\n\n"
         f"{emoji} <b>Вы выиграли:</b> {won_item['name']}\n"
         f"🏷 <b>Редкость:</b> {won_item['rarity']}\n"
         f"💰 <b>Стоимость:</b> {won_item['price']} голды\n"
         f"📊 <b>Шанс выпадения:</b> {won_item['chance']}%\n\n"
         f"📦 <b>Открытый кейс:</b> {case_name}\n\n"
-        "Выберите действие:",
+        + ("♻️ Предмет продан автоматически, голда зачислена на баланс"
+           if won_item.get('auto_sold') else "Выберите действие:")
+    )
+    return text, kb
+
+
+@router.callback_query(OPEN_CASES)
+async def open_cases_handler(callback: CallbackQuery, uow: UnitOfWork, limit: int = None):
+    """Открываем все (или N) кейсов разом и показываем один итог"""
+    won_items = await db.open_cases(callback.from_user.id, limit)
+    if not won_items:
+        await callback.answer("❌ Нет кейсов для открытия")
+        return
+
+    # Фиксируем выигрыш до того, как показать его пользователю
+    await uow.commit()
+
+    # Группируем одинаковые предметы, дорогие - сверху
+    grouped = {}
+    for item in won_items:
+        entry = grouped.setdefault(item['name'], {"item": item, "count": 0})
+        entry["count"] += 1
+    entries = sorted(grouped.values(), key=lambda e: e["item"]['price'], reverse=True)
+    total = sum(item['price'] for item in won_items)
+    auto_sold = [item for item in won_items if item['auto_sold']]
+
+    lines = []
+    for entry in entries[:BULK_SUMMARY_LINES]:
+        item = entry["item"]
+        count = f" ×{entry['count']}" if entry["count"] > 1 else ""
+        lines.append(f"{item.get('emoji', '⚪')} {item['name']} |{item['rarity']}|{count} - {item['price']}G")
+    if len(entries) > BULK_SUMMARY_LINES:
+        lines.append(f"...и еще {len(entries) - BULK_SUMMARY_LINES} видов предметов")
+
+    kb = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🎒 В инвентарь", callback_data="inventory")],
+            [InlineKeyboardButton(text="🏠 В меню", callback_data="menu")]
+        ]
+    )
+
+    await callback.message.edit_text(
+        f"🎉 <b>Открыто кейсов: {len(won_items)}</b>\n\n"
+        + "\n".join(lines) +
+        f"\n\n💰 <b>Общая стоимость:</b> {total:.2f} голды\n\n"
+        + (f"♻️ Продано автоматически: {len(auto_sold)} на "
+           f"{sum(item['price'] for item in auto_sold):.2f} голды\nОстальные предметы добавлены в инвентарь"
+           if auto_sold else "Предметы добавлены в инвентарь"),
         reply_markup=kb,
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data.startswith("item_"))
-async def show_item_details(callback: CallbackQuery):
+@router.callback_query(ITEM)
+async def show_item_details(callback: CallbackQuery, stack_id: int):
     """Показываем детали предмета"""
-    item_id = int(callback.data.split("_")[1])
 
-    # Получаем информацию о предмете
-    item = db.get_item_by_id(item_id)
+    # Получаем информацию о стопке предметов (только своей)
+    item = await db.get_stack(callback.from_user.id, stack_id)
     if not item:
         await callback.answer("❌ Предмет не найден")
         return
@@ -211,7 +372,7 @@ async def show_item_details(callback: CallbackQuery):
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="💰 Продать", callback_data=f"sell_{item_id}"),
+                InlineKeyboardButton(text="💰 Продать", callback_data=SELL.pack(stack_id=stack_id)),
                 InlineKeyboardButton(text="💾 Оставить", callback_data="inventory")
             ],
             [InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory")]
@@ -222,37 +383,46 @@ async def show_item_details(callback: CallbackQuery):
         f"{emoji} <b>Детали предмета:</b>\n\n"
         f"🎯 <b>Название:</b> {item['item_name']}\n"
         f"🏷 <b>Редкость:</b> {item['item_rarity']}\n"
-        f"💰 <b>Стоимость:</b> {item['item_price']} голды\n\n"
+        f"💰 <b>Стоимость:</b> {item['item_price']} голды\n"
+        f"📦 <b>Количество:</b> {item['quantity']}\n\n"
         "Выберите действие:",
         reply_markup=kb,
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data.startswith("sell_won_"))
-async def sell_won_item(callback: CallbackQuery):
+@router.callback_query(SELL_WON)
+async def sell_won_item(callback: CallbackQuery, uow: UnitOfWork, stack_id: int):
     """Продаем только что выигранный предмет"""
-    parts = callback.data.split("_")
-    if len(parts) < 4:
-        await callback.answer("❌ Ошибка в данных")
-        return
+    await sell_from_stack(callback, uow, stack_id)
+
+
+@router.callback_query(SELL)
+async def sell_item(callback: CallbackQuery, uow: UnitOfWork, stack_id: int):
+    """Продаем предмет"""
+    await sell_from_stack(callback, uow, stack_id)
+
 
-    price = float(parts[2])
-    inventory_id = int(parts[3]) if len(parts) > 3 else None
+async def sell_from_stack(callback: CallbackQuery, uow: UnitOfWork, stack_id: int):
+    """Продаем один предмет из стопки и показываем итог"""
     user_id = callback.from_user.id
 
-    # Начисляем GOLD
-    db.update_balance(user_id, price)
+    item = await db.get_stack(user_id, stack_id)
+    if not item:
+        await callback.answer("❌ Предмет не найден")
+        return
+
+    # Условное списание из стопки не даст продать один предмет дважды
+    if not await db.remove_from_stack(user_id, stack_id):
+        await callback.answer("❌ Предмет уже продан")
+        return
 
-    # Удаляем инвентарный предмет (если есть inventory_id)
-    if inventory_id:
-        # Проверяем, существует ли еще предмет
-        item = db.get_item_by_id(inventory_id)
-        if item:
-            db.remove_from_inventory(inventory_id)
+    # Начисляем GOLD по цене из базы, а не из callback_data
+    await db.update_balance(user_id, item['item_price'], reason="sale", ref_id=stack_id)
 
-    # Получаем актуальный баланс
-    user = db.get_user(user_id)
+    # Получаем актуальный баланс и фиксируем продажу одним коммитом
+    user = await db.get_user(user_id)
+    await uow.commit()
 
     # Создаем клавиатуру
     kb = InlineKeyboardMarkup(
@@ -265,7 +435,8 @@ async def sell_won_item(callback: CallbackQuery):
 
     await callback.message.edit_text(
         f"✅ <b>Предмет продан!</b>\n\n"
-        f"💰 <b>Получено:</b> {price} голды\n"
+        f"🎯 <b>Продано:</b> {item['item_name']}\n"
+        f"💰 <b>Получено:</b> {item['item_price']} голды\n"
         f"🏦 <b>Баланс:</b> {user['balance']:.2f} голды\n\n"
         f"Вы можете вывести средства в разделе 💰 Вывод",
         reply_markup=kb,
@@ -273,42 +444,115 @@ async def sell_won_item(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("sell_"))
-async def sell_item(callback: CallbackQuery):
-    """Продаем предмет"""
-    item_id = int(callback.data.split("_")[1])
-    user_id = callback.from_user.id
+@router.callback_query(callbacks.exact("bulk_sell"))
+async def bulk_sell_menu(callback: CallbackQuery):
+    """Выбор, что продать разом: по редкости или дешевле порога"""
+    kb = InlineKeyboardBuilder()
+    for threshold in BULK_SELL_THRESHOLDS:
+        kb.button(text=f"Дешевле {threshold}G", callback_data=BULK_SELL.pack(kind="price", value=threshold))
+    for rarity in get_catalog().rarities:
+        kb.button(text=f"Все {rarity}", callback_data=BULK_SELL.pack(kind="rarity", value=rarity))
+    kb.adjust(len(BULK_SELL_THRESHOLDS), 2)
+    kb.row(InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory"))
 
-    # Получаем информацию о предмете
-    item = db.get_item_by_id(item_id)
-    if not item:
-        await callback.answer("❌ Предмет не найден")
+    await callback.message.edit_text(
+        "💰 <b>Массовая продажа</b>\n\n"
+        "Выберите, какие предметы продать:",
+        reply_markup=kb.as_markup(),
+        parse_mode="HTML"
+    )
+
+
+def bulk_sell_filter(kind: str, value: str):
+    """<price|rarity>, <значение> -> (редкость, порог цены, подпись)"""
+    if kind == "price":
+        return None, float(value), f"дешевле {value}G"
+    return value, None, f"редкости {value}"
+
+
+@router.callback_query(BULK_SELL)
+async def bulk_sell_preview(callback: CallbackQuery, kind: str, value: str):
+    """Показываем, сколько предметов будет продано и за сколько"""
+    rarity, max_price, label = bulk_sell_filter(kind, value)
+    summary = await db.get_stacks_value(callback.from_user.id, rarity, max_price)
+    if not summary['quantity']:
+        await callback.answer("❌ Нет подходящих предметов")
         return
 
-    # Начисляем GOLD
-    db.update_balance(user_id, item['item_price'])
+    await callback.message.edit_text(
+        f"💰 <b>Продать все предметы {label}?</b>\n\n"
+        f"📦 <b>Предметов:</b> {summary['quantity']}\n"
+        f"💰 <b>Сумма:</b> {summary['total']:.2f} голды",
+        reply_markup=yes_no_menu(BULK_SOLD.pack(kind=kind, value=value), "bulk_sell"),
+        parse_mode="HTML"
+    )
 
-    # Удаляем предмет из инвентаря
-    db.remove_from_inventory(item_id)
 
-    # Получаем актуальный баланс
-    user = db.get_user(user_id)
+@router.callback_query(BULK_SOLD)
+async def bulk_sell_confirm(callback: CallbackQuery, uow: UnitOfWork, kind: str, value: str):
+    """Продаем выбранные предметы одной транзакцией"""
+    rarity, max_price, label = bulk_sell_filter(kind, value)
+    user_id = callback.from_user.id
+
+    sold = await db.sell_stacks(user_id, rarity, max_price)
+    if not sold['quantity']:
+        await callback.answer("❌ Предметы уже проданы")
+        return
+
+    user = await db.get_user(user_id)
+    await uow.commit()
 
-    # Создаем клавиатуру
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="🎒 В инвентарь", callback_data="inventory")],
-            [InlineKeyboardButton(text="⭐ Оставить отзыв", callback_data="leave_review")],
             [InlineKeyboardButton(text="🏠 В меню", callback_data="menu")]
         ]
     )
 
     await callback.message.edit_text(
-        f"✅ <b>Предмет продан!</b>\n\n"
-        f"🎯 <b>Продано:</b> {item['item_name']}\n"
-        f"💰 <b>Получено:</b> {item['item_price']} голды\n"
-        f"🏦 <b>Баланс:</b> {user['balance']:.2f} голды\n\n"
-        f"Вы можете вывести средства в разделе 💰 Вывод",
+        f"✅ <b>Продано предметов {label}: {sold['quantity']}</b>\n\n"
+        f"💰 <b>Получено:</b> {sold['total']:.2f} голды\n"
+        f"🏦 <b>Баланс:</b> {user['balance']:.2f} голды",
         reply_markup=kb,
         parse_mode="HTML"
     )
+
+
+@router.callback_query(callbacks.exact("auto_sell"))
+@router.callback_query(AUTO_SELL)
+async def auto_sell_menu(callback: CallbackQuery, kind: str = None, value: str = None):
+    """Правила автопродажи: кнопки price/<порог> и rarity/<редкость> включают и выключают правило"""
+    user_id = callback.from_user.id
+
+    if kind is not None:
+        rules = {rule['rarity']: rule['max_price'] for rule in await db.get_auto_sell_rules(user_id)}
+        if kind == "price":
+            if rules.get('') == float(value):
+                await db.delete_auto_sell_rule(user_id)
+            else:
+                await db.set_auto_sell_rule(user_id, max_price=float(value))
+        elif value in rules:
+            await db.delete_auto_sell_rule(user_id, value)
+        else:
+            await db.set_auto_sell_rule(user_id, value)
+
+    rules = {rule['rarity']: rule['max_price'] for rule in await db.get_auto_sell_rules(user_id)}
+
+    kb = InlineKeyboardBuilder()
+    for threshold in BULK_SELL_THRESHOLDS:
+        mark = "✅ " if rules.get('') == threshold else ""
+        kb.button(text=f"{mark}Дешевле {threshold}G", callback_data=AUTO_SELL.pack(kind="price", value=threshold))
+    for rarity in get_catalog().rarities:
+        mark = "✅ " if rarity in rules else ""
+        kb.button(text=f"{mark}Все {rarity}", callback_data=AUTO_SELL.pack(kind="rarity", value=rarity))
+    kb.adjust(len(BULK_SELL_THRESHOLDS), 2)
+    kb.row(InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory"))
+
+    await callback.message.edit_text(
+        "♻️ <b>Автопродажа</b>\n\n"
+        "Отмеченные предметы продаются сразу при открытии кейса, "
+        "голда зачисляется на баланс без захода в инвентарь.",
+        reply_markup=kb.as_markup(),
+        parse_mode="HTML"
+    )
+    await callback.answer()
@@ -5,14 +5,20 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKe
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from config import CASES, CARD_NUMBER, CARD_HOLDER, BANK, ADMIN_IDS, MIN_STARS_PURCHASE
+from config import CARD_NUMBER, CARD_HOLDER, BANK, ADMIN_IDS, MIN_STARS_PURCHASE, CATALOG_DISCOUNT_TIERS
 from keyboards.buttons import payment_methods_menu, confirm_payment_menu
-from database.db import Database
+from database.async_db import AsyncDatabase
+from database.unit_of_work import UnitOfWork
+from utils.catalog import get_catalog, discounted_price
+from keyboards.callback_data import ADMIN_CONFIRM, ADMIN_REJECT, APPLY_PROMO, BUY, CASE, PAID, PAY_CARD, PAY_STARS
 
 logger = logging.getLogger(__name__)
 
+# Скидка, которую обещаем в подсказке про промокод
+PROMO_DISCOUNT = CATALOG_DISCOUNT_TIERS[0]
+
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 class PaymentStates(StatesGroup):
@@ -20,10 +26,9 @@ class PaymentStates(StatesGroup):
     waiting_promo = State()
 
 
-@router.callback_query(F.data.startswith("buy_"))
-async def buy_case_start(callback: CallbackQuery, state: FSMContext):
-    case_id = int(callback.data.split("_")[1])
-    case = CASES.get(case_id)
+@router.callback_query(BUY)
+async def buy_case_start(callback: CallbackQuery, state: FSMContext, case_id: int):
+    case = get_catalog().get(case_id)
 
     if not case:
         await callback.answer("Кейс не найден")
@@ -32,7 +37,7 @@ async def buy_case_start(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
     # Проверяем, использовал ли пользователь ЛЮБОЙ промокод
-    has_used_promo = db.has_user_used_any_promo(user_id)
+    has_used_promo = await db.has_user_used_any_promo(user_id)
 
     # Сбрасываем предыдущие данные
     await state.clear()
@@ -44,6 +49,7 @@ async def buy_case_start(callback: CallbackQuery, state: FSMContext):
         has_used_promo=has_used_promo
     )
 
+    promo_price = case['discounts'][PROMO_DISCOUNT]
     if has_used_promo:
         text = (
             f"💰 <b>Покупка кейса:</b> {case['name']}\n"
@@ -55,7 +61,7 @@ async def buy_case_start(callback: CallbackQuery, state: FSMContext):
         text = (
             f"💰 <b>Покупка кейса:</b> {case['name']}\n"
             f"📦 Стоимость: <b>{case['price']}₽</b> или <b>{case['stars']} ⭐</b>\n"
-            f"💎 Со скидкой: <b>{case['price'] * 0.8:.0f}₽</b> (~{int(case['stars'] * 0.8)} ⭐)\n\n"
+            f"💎 Со скидкой: <b>{promo_price['price']:.0f}₽</b> (~{promo_price['stars']} ⭐)\n\n"
             f"<i>Можно применить промокод для скидки 20%</i>\n"
             f"Выберите способ оплаты:"
         )
@@ -67,10 +73,9 @@ async def buy_case_start(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("pay_card_"))
-async def pay_with_card(callback: CallbackQuery, state: FSMContext):
-    case_id = int(callback.data.split("_")[2])
-    case = CASES.get(case_id)
+@router.callback_query(PAY_CARD)
+async def pay_with_card(callback: CallbackQuery, state: FSMContext, case_id: int):
+    case = get_catalog().get(case_id)
 
     if not case:
         await callback.answer("Кейс не найден")
@@ -80,7 +85,7 @@ async def pay_with_card(callback: CallbackQuery, state: FSMContext):
     price = data.get('price', case["price"])
 
     # Создаем заказ
-    order_id = db.create_order(
+    order_id = await db.create_order(
         telegram_id=callback.from_user.id,
         case_id=case_id,
         amount=price,
@@ -113,10 +118,9 @@ async def pay_with_card(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("pay_stars_"))
-async def pay_with_stars(callback: CallbackQuery):
-    case_id = int(callback.data.split("_")[2])
-    case = CASES.get(case_id)
+@router.callback_query(PAY_STARS)
+async def pay_with_stars(callback: CallbackQuery, case_id: int):
+    case = get_catalog().get(case_id)
 
     if not case:
         await callback.answer("❌ Кейс не найден")
@@ -141,7 +145,7 @@ async def pay_with_stars(callback: CallbackQuery):
         )
 
         # Создаем заказ
-        order_id = db.create_order(
+        order_id = await db.create_order(
             telegram_id=callback.from_user.id,
             case_id=case_id,
             amount=stars_needed,
@@ -160,7 +164,7 @@ async def pay_with_stars(callback: CallbackQuery):
             reply_markup=InlineKeyboardMarkup(
                 inline_keyboard=[
                     [InlineKeyboardButton(text=f"💫 Оплатить {stars_needed} ⭐", url=invoice)],
-                    [InlineKeyboardButton(text="◀️ Назад", callback_data=f"case_{case_id}")]
+                    [InlineKeyboardButton(text="◀️ Назад", callback_data=CASE.pack(case_id=case_id))]
                 ]
             ),
             parse_mode="HTML"
@@ -171,19 +175,18 @@ async def pay_with_stars(callback: CallbackQuery):
         await callback.answer("❌ Ошибка создания платежа. Попробуйте позже.")
 
 
-@router.callback_query(F.data.startswith("apply_promo_"))
-async def apply_promo_to_purchase(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(APPLY_PROMO)
+async def apply_promo_to_purchase(callback: CallbackQuery, state: FSMContext, case_id: int):
     """Применение промокода к покупке"""
-    case_id = int(callback.data.split("_")[2])
     user_id = callback.from_user.id
 
-    case = CASES.get(case_id)
+    case = get_catalog().get(case_id)
     if not case:
         await callback.answer("❌ Кейс не найден")
         return
 
     # Проверяем, не использовал ли уже промокод
-    if db.has_user_used_any_promo(user_id):
+    if await db.has_user_used_any_promo(user_id):
         await callback.answer("❌ Вы уже использовали промокод", show_alert=True)
         return
 
@@ -194,27 +197,23 @@ async def apply_promo_to_purchase(callback: CallbackQuery, state: FSMContext):
         original_stars=case["stars"]
     )
 
+    promo_price = case['discounts'][PROMO_DISCOUNT]
     await callback.message.edit_text(
         "🎟 <b>Введите промокод для скидки 20%</b>\n\n"
         f"Кейс: {case['name']}\n"
         f"Цена без скидки: {case['price']}₽ ({case['stars']} ⭐)\n"
-        f"Цена со скидкой: {case['price'] * 0.8:.0f}₽ (~{int(case['stars'] * 0.8)} ⭐)\n\n"
+        f"Цена со скидкой: {promo_price['price']:.0f}₽ (~{promo_price['stars']} ⭐)\n\n"
         "<i>Напишите /cancel для отмены</i>",
         parse_mode="HTML"
     )
 
 
-@router.callback_query(F.data.startswith("paid_"))
-async def confirm_payment(callback: CallbackQuery):
+@router.callback_query(PAID)
+async def confirm_payment(callback: CallbackQuery, order_id: int):
     """Пользователь подтверждает оплату картой"""
-    try:
-        order_id = int(callback.data.split("_")[1])
-    except (IndexError, ValueError):
-        await callback.answer("❌ Ошибка в данных заказа")
-        return
 
     # Получаем заказ из базы по ID
-    order = db.get_order_by_id(order_id)
+    order = await db.get_order_by_id(order_id)
 
     if not order:
         await callback.answer("❌ Заказ не найден")
@@ -232,7 +231,7 @@ async def confirm_payment(callback: CallbackQuery):
         return
 
     # Обновляем статус заказа на "waiting_confirmation"
-    db.update_order_status(order_id, "waiting_confirmation")
+    await db.update_order_status(order_id, "waiting_confirmation")
 
     await callback.message.edit_text(
         "✅ <b>Спасибо! Ваша оплата принята</b>\n\n"
@@ -248,14 +247,13 @@ async def confirm_payment(callback: CallbackQuery):
     )
 
     # Уведомляем админа С КНОПКОЙ
-    from config import CASES, ADMIN_IDS
-    case = CASES.get(order['case_id'], {})
+    case = get_catalog().get(order['case_id']) or {}
 
     kb_admin = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"admin_confirm_{order_id}"),
-                InlineKeyboardButton(text="❌ Отклонить", callback_data=f"admin_reject_{order_id}")
+                InlineKeyboardButton(text="✅ Подтвердить", callback_data=ADMIN_CONFIRM.pack(order_id=order_id)),
+                InlineKeyboardButton(text="❌ Отклонить", callback_data=ADMIN_REJECT.pack(order_id=order_id))
             ]
         ]
     )
@@ -295,20 +293,20 @@ async def process_promo_for_purchase(message: Message, state: FSMContext):
     original_price = data.get('original_price')
     original_stars = data.get('original_stars')
 
-    case = CASES.get(case_id)
+    case = get_catalog().get(case_id)
     if not case:
         await message.answer("❌ Кейс не найден")
         await state.clear()
         return
 
     # Проверяем, не использовал ли уже промокод
-    if db.has_user_used_any_promo(user_id):
+    if await db.has_user_used_any_promo(user_id):
         await message.answer("❌ Вы уже использовали промокод")
         await state.clear()
         return
 
     # Проверяем промокод
-    promo = db.check_promocode(promo_code)
+    promo = await db.check_promocode(promo_code)
 
     if not promo:
         await message.answer(
@@ -317,8 +315,8 @@ async def process_promo_for_purchase(message: Message, state: FSMContext):
             reply_markup=InlineKeyboardMarkup(
                 inline_keyboard=[
                     [
-                        InlineKeyboardButton(text="🔄 Попробовать другой", callback_data=f"apply_promo_{case_id}"),
-                        InlineKeyboardButton(text="🚀 Без скидки", callback_data=f"pay_card_{case_id}")
+                        InlineKeyboardButton(text="🔄 Попробовать другой", callback_data=APPLY_PROMO.pack(case_id=case_id)),
+                        InlineKeyboardButton(text="🚀 Без скидки", callback_data=PAY_CARD.pack(case_id=case_id))
                     ]
                 ]
             ),
@@ -328,18 +326,19 @@ async def process_promo_for_purchase(message: Message, state: FSMContext):
         return
 
     # Проверяем, использовал ли уже этот промокод
-    if db.has_user_used_this_promo(user_id, promo_code):
+    if await db.has_user_used_this_promo(user_id, promo_code):
         await message.answer("❌ Вы уже использовали этот промокод")
         await state.clear()
         return
 
     # Применяем скидку
     discount = promo.get('discount', 0.2)
-    final_price = original_price * (1 - discount)
-    final_stars = int(original_stars * (1 - discount))
+    final = discounted_price(case, discount)
+    final_price = final['price']
+    final_stars = final['stars']
 
     # Помечаем промокод как использованный
-    success = db.use_promocode(promo_code, user_id)
+    success = await db.use_promocode(promo_code, user_id)
 
     if not success:
         await message.answer("❌ Ошибка применения промокода")
@@ -376,7 +375,7 @@ async def process_pre_checkout(pre_checkout_query: PreCheckoutQuery):
 
 
 @router.message(F.successful_payment)
-async def process_successful_payment(message: Message):
+async def process_successful_payment(message: Message, uow: UnitOfWork):
     payment = message.successful_payment
 
     # Получаем данные из payload
@@ -392,10 +391,10 @@ async def process_successful_payment(message: Message):
                 await message.answer("❌ Ошибка: платеж от другого пользователя")
                 return
 
-            case = CASES.get(case_id)
+            case = get_catalog().get(case_id)
             if case:
                 # Создаем заказ со статусом completed
-                order_id = db.create_order(
+                order_id = await db.create_order(
                     telegram_id=user_id,
                     case_id=case_id,
                     amount=payment.total_amount / 100,
@@ -404,7 +403,7 @@ async def process_successful_payment(message: Message):
 
                 if order_id:
                     # Обновляем статус заказа
-                    db.update_order_status(order_id, "completed")
+                    await db.update_order_status(order_id, "completed")
 
                     # Сохраняем кейс в инвентарь
                     case_item = {
@@ -413,7 +412,10 @@ async def process_successful_payment(message: Message):
                         "price": 0,
                     }
 
-                    db.add_to_inventory(user_id, case_id, case_item)
+                    await db.add_to_inventory(user_id, case_id, case_item)
+
+                    # Звезды уже списаны: кейс фиксируем до ответа пользователю
+                    await uow.commit()
 
                     await message.answer(
                         f"✅ <b>Оплата успешно принята!</b>\n\n"
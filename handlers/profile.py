@@ -4,10 +4,13 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from config import MIN_WITHDRAWAL
-from database.db import Database
+from database.async_db import AsyncDatabase
+from database.unit_of_work import UnitOfWork
+from keyboards.callback_data import ADMIN_WITHDRAW_CONFIRM
+from utils.callback_router import callbacks
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 class WithdrawStates(StatesGroup):
@@ -19,7 +22,7 @@ class WithdrawStates(StatesGroup):
 
 
 @router.message(F.text == "👤 Профиль")
-@router.callback_query(F.data == "profile")
+@router.callback_query(callbacks.exact("profile"))
 async def show_profile(event: Message | CallbackQuery):
     if isinstance(event, CallbackQuery):
         message = event.message
@@ -28,7 +31,7 @@ async def show_profile(event: Message | CallbackQuery):
         message = event
         user_id = event.from_user.id
 
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
 
     if not user:
         await message.answer("Ошибка получения профиля")
@@ -58,7 +61,7 @@ async def show_profile(event: Message | CallbackQuery):
 
 
 @router.message(F.text == "💰 Вывод")
-@router.callback_query(F.data == "withdraw")
+@router.callback_query(callbacks.exact("withdraw"))
 async def start_withdraw(callback: CallbackQuery, state: FSMContext):
     if isinstance(callback, CallbackQuery):
         user_id = callback.from_user.id
@@ -67,7 +70,7 @@ async def start_withdraw(callback: CallbackQuery, state: FSMContext):
         user_id = callback.from_user.id
         message = callback
 
-    user = db.get_user(user_id)
+    user = await db.get_user(user_id)
 
     if user['balance'] < MIN_WITHDRAWAL:
         if isinstance(callback, CallbackQuery):
@@ -95,7 +98,7 @@ async def process_withdraw_amount(message: Message, state: FSMContext):
         await message.answer("❌ Введите корректное число")
         return
 
-    user = db.get_user(message.from_user.id)
+    user = await db.get_user(message.from_user.id)
 
     if amount < MIN_WITHDRAWAL:
         await message.answer(f"❌ Минимальная сумма вывода: {MIN_WITHDRAWAL} голды")
@@ -201,7 +204,7 @@ async def process_withdraw_skin_price(message: Message, state: FSMContext):
 
 
 @router.message(WithdrawStates.waiting_screenshot)
-async def process_withdraw_screenshot(message: Message, state: FSMContext):
+async def process_withdraw_screenshot(message: Message, state: FSMContext, uow: UnitOfWork):
     if not message.photo and not message.document:
         await message.answer("❌ Пожалуйста, отправьте скриншот")
         return
@@ -212,7 +215,7 @@ async def process_withdraw_screenshot(message: Message, state: FSMContext):
     # Создаем заявку на вывод
     file_id = message.photo[-1].file_id if message.photo else message.document.file_id
 
-    withdrawal_id = db.create_withdrawal(
+    withdrawal_id = await db.create_withdrawal(
         telegram_id=message.from_user.id,
         amount=data['amount'],
         game_nickname=data['game_nickname'],
@@ -227,7 +230,12 @@ async def process_withdraw_screenshot(message: Message, state: FSMContext):
         return
 
     # Списываем средства
-    db.update_balance(message.from_user.id, -data['amount'])
+    await db.update_balance(message.from_user.id, -data['amount'], reason="withdrawal",
+                            idempotency_key=f"withdrawal:{withdrawal_id}", ref_id=withdrawal_id)
+
+    # Заявку и списание фиксируем до рассылки админам: транзакция не ждет
+    # Telegram, а ошибка уведомления не откатывает уже созданную заявку
+    await uow.commit()
 
     # Уведомляем админа
     from config import ADMIN_IDS
@@ -252,7 +260,7 @@ async def process_withdraw_screenshot(message: Message, state: FSMContext):
                     [
                         InlineKeyboardButton(
                             text="✅ Подтвердить",
-                            callback_data=f"admin_withdraw_confirm_{withdrawal_id}"
+                            callback_data=ADMIN_WITHDRAW_CONFIRM.pack(withdrawal_id=withdrawal_id)
                         )
                     ],
                     [
@@ -307,24 +315,13 @@ async def process_withdraw_screenshot(message: Message, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(F.data == "my_withdrawals")
+@router.callback_query(callbacks.exact("my_withdrawals"))
 async def show_my_withdrawals(callback: CallbackQuery):
     """Показать заявки пользователя"""
     user_id = callback.from_user.id
 
     # Получаем заявки пользователя из БД
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT w.* FROM withdrawals w
-        JOIN users u ON w.user_id = u.id
-        WHERE u.telegram_id = ?
-        ORDER BY w.created_at DESC
-        LIMIT 10
-    ''', (user_id,))
-
-    withdrawals = cursor.fetchall()
-    conn.close()
+    withdrawals = await db.get_user_withdrawals(user_id, 10)
 
     if not withdrawals:
         text = "📋 <b>Ваши заявки на вывод</b>\n\nУ вас нет заявок на вывод."
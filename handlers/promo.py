@@ -4,10 +4,11 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 
-from database.db import Database
+from database.async_db import AsyncDatabase
+from utils.callback_router import callbacks
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 class PromoStates(StatesGroup):
@@ -15,7 +16,7 @@ class PromoStates(StatesGroup):
 
 
 @router.message(F.text == "🎟 Промокод")
-@router.callback_query(F.data == "promo")
+@router.callback_query(callbacks.exact("promo"))
 async def promo_menu(event: Message | CallbackQuery, state: FSMContext):
     """Меню промокодов"""
     if isinstance(event, CallbackQuery):
@@ -26,7 +27,7 @@ async def promo_menu(event: Message | CallbackQuery, state: FSMContext):
         user_id = event.from_user.id
 
     # Проверяем, использовал ли пользователь ЛЮБОЙ промокод
-    has_used_any_promo = db.has_user_used_any_promo(user_id)
+    has_used_any_promo = await db.has_user_used_any_promo(user_id)
 
     if has_used_any_promo:
         text = (
@@ -60,13 +61,13 @@ async def promo_menu(event: Message | CallbackQuery, state: FSMContext):
         await message.answer(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(F.data == "enter_promo")
+@router.callback_query(callbacks.exact("enter_promo"))
 async def enter_promo(callback: CallbackQuery, state: FSMContext):
     """Ввод промокода"""
     user_id = callback.from_user.id
 
     # Проверяем, не использовал ли уже ЛЮБОЙ промокод
-    if db.has_user_used_any_promo(user_id):
+    if await db.has_user_used_any_promo(user_id):
         await callback.answer("❌ Вы уже использовали промокод", show_alert=True)
         return
 
@@ -93,13 +94,13 @@ async def process_promo_code(message: Message, state: FSMContext):
     promo_code = message.text.strip().upper()
 
     # Проверяем, не использовал ли уже ЛЮБОЙ промокод
-    if db.has_user_used_any_promo(user_id):
+    if await db.has_user_used_any_promo(user_id):
         await message.answer("❌ Вы уже использовали промокод")
         await state.clear()
         return
 
     # Проверяем промокод
-    promo = db.check_promocode(promo_code)
+    promo = await db.check_promocode(promo_code)
 
     if not promo:
         await message.answer(
@@ -116,13 +117,13 @@ async def process_promo_code(message: Message, state: FSMContext):
         return
 
     # Проверяем, использовал ли уже этот промокод
-    if db.has_user_used_this_promo(user_id, promo_code):
+    if await db.has_user_used_this_promo(user_id, promo_code):
         await message.answer("❌ Вы уже использовали этот промокод")
         await state.clear()
         return
 
     # Помечаем промокод как использованный
-    success = db.use_promocode(promo_code, user_id)
+    success = await db.use_promocode(promo_code, user_id)
 
     if not success:
         await message.answer("❌ Ошибка применения промокода")
@@ -5,10 +5,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from config import REVIEW_CHANNEL_ID
-from database.db import Database
+from database.async_db import AsyncDatabase
+from keyboards.callback_data import RATE
+from utils.callback_router import callbacks
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 
 class ReviewStates(StatesGroup):
@@ -49,7 +51,7 @@ async def resolve_channel_id(bot, channel_identifier):
 
 
 @router.message(F.text == "⭐ Отзывы")
-@router.callback_query(F.data == "reviews")
+@router.callback_query(callbacks.exact("reviews"))
 async def show_reviews(event: Message | CallbackQuery):
     """Показываем меню отзывов"""
     if isinstance(event, CallbackQuery):
@@ -62,7 +64,7 @@ async def show_reviews(event: Message | CallbackQuery):
         bot = event.bot
 
     # Проверяем, оставлял ли пользователь отзыв
-    has_reviewed = db.has_user_reviewed(user_id)
+    has_reviewed = await db.has_user_reviewed(user_id)
 
     # Создаем клавиатуру
     keyboard_buttons = []
@@ -74,7 +76,7 @@ async def show_reviews(event: Message | CallbackQuery):
         ])
     else:
         # Пользователь уже оставлял отзыв
-        review = db.get_user_review(user_id)
+        review = await db.get_user_review(user_id)
         if review:
             rating = review.get('rating', 5)
             keyboard_buttons.append([
@@ -130,13 +132,13 @@ async def show_reviews(event: Message | CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "leave_review")
+@router.callback_query(callbacks.exact("leave_review"))
 async def start_review(callback: CallbackQuery, state: FSMContext):
     """Начинаем процесс оставления отзыва"""
     user_id = callback.from_user.id
 
     # Проверяем, не оставлял ли уже отзыв
-    if db.has_user_reviewed(user_id):
+    if await db.has_user_reviewed(user_id):
         await callback.answer("❌ Вы уже оставляли отзыв", show_alert=True)
         return
 
@@ -149,13 +151,13 @@ async def start_review(callback: CallbackQuery, state: FSMContext):
         reply_markup=InlineKeyboardMarkup(
             inline_keyboard=[
                 [
-                    InlineKeyboardButton(text="⭐", callback_data="rate_1"),
-                    InlineKeyboardButton(text="⭐⭐", callback_data="rate_2"),
-                    InlineKeyboardButton(text="⭐⭐⭐", callback_data="rate_3")
+                    InlineKeyboardButton(text="⭐", callback_data=RATE.pack(rating=1)),
+                    InlineKeyboardButton(text="⭐⭐", callback_data=RATE.pack(rating=2)),
+                    InlineKeyboardButton(text="⭐⭐⭐", callback_data=RATE.pack(rating=3))
                 ],
                 [
-                    InlineKeyboardButton(text="⭐⭐⭐⭐", callback_data="rate_4"),
-                    InlineKeyboardButton(text="⭐⭐⭐⭐⭐", callback_data="rate_5")
+                    InlineKeyboardButton(text="⭐⭐⭐⭐", callback_data=RATE.pack(rating=4)),
+                    InlineKeyboardButton(text="⭐⭐⭐⭐⭐", callback_data=RATE.pack(rating=5))
                 ],
                 [InlineKeyboardButton(text="◀️ Отмена", callback_data="menu")]
             ]
@@ -164,11 +166,11 @@ async def start_review(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "view_my_review")
+@router.callback_query(callbacks.exact("view_my_review"))
 async def view_my_review(callback: CallbackQuery):
     """Показываем отзыв пользователя"""
     user_id = callback.from_user.id
-    review = db.get_user_review(user_id)
+    review = await db.get_user_review(user_id)
 
     if not review:
         await callback.answer("❌ Отзыв не найден")
@@ -196,20 +198,18 @@ async def view_my_review(callback: CallbackQuery):
     )
 
 
-@router.callback_query(ReviewStates.waiting_rating, F.data.startswith("rate_"))
-async def process_rating(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ReviewStates.waiting_rating, RATE)
+async def process_rating(callback: CallbackQuery, state: FSMContext, rating: int):
     """Обрабатываем выбор рейтинга"""
     user_id = callback.from_user.id
 
     # Двойная проверка
-    if db.has_user_reviewed(user_id):
+    if await db.has_user_reviewed(user_id):
         await callback.answer("❌ Вы уже оставляли отзыв", show_alert=True)
         await state.clear()
         await show_reviews(callback)
         return
 
-    rating = int(callback.data.split("_")[1])
-
     if rating < 1 or rating > 5:
         await callback.answer("❌ Некорректная оценка")
         return
@@ -234,7 +234,7 @@ async def process_review_text(message: Message, state: FSMContext):
     user_id = message.from_user.id
 
     # Финальная проверка
-    if db.has_user_reviewed(user_id):
+    if await db.has_user_reviewed(user_id):
         await message.answer("❌ Вы уже оставляли отзыв")
         await state.clear()
         return
@@ -254,7 +254,7 @@ async def process_review_text(message: Message, state: FSMContext):
     rating = data.get('rating', 5)
 
     # Сохраняем отзыв в БД
-    success = db.add_review(user_id, rating, text)
+    success = await db.add_review(user_id, rating, text)
 
     if not success:
         await message.answer("❌ Ошибка при сохранении отзыва")
@@ -322,7 +322,7 @@ async def process_review_text(message: Message, state: FSMContext):
 async def cmd_myreview(message: Message):
     """Команда для просмотра своего отзыва"""
     user_id = message.from_user.id
-    review = db.get_user_review(user_id)
+    review = await db.get_user_review(user_id)
 
     if not review:
         await message.answer("❌ Вы еще не оставляли отзыв")
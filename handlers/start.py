@@ -1,12 +1,12 @@
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram import Router
+from aiogram.types import Message
 from aiogram.filters import CommandStart, Command
 
-from database.db import Database
+from database.async_db import AsyncDatabase
 from keyboards.buttons import main_menu
 
 router = Router()
-db = Database()
+db = AsyncDatabase()
 
 WELCOME_TEXT = """
 ⚔ <b>SharpDrop - Кейсы Standoff 2</b>
@@ -26,7 +26,7 @@ WELCOME_TEXT = """
 
 @router.message(CommandStart())
 async def cmd_start(message: Message):
-    db.add_user(
+    await db.add_user(
         telegram_id=message.from_user.id,
         username=message.from_user.username,
         full_name=message.from_user.full_name
@@ -37,12 +37,3 @@ async def cmd_start(message: Message):
         reply_markup=main_menu(),
         parse_mode="HTML"
     )
-
-
-@router.callback_query(F.data == "menu")
-async def back_to_menu(callback: CallbackQuery):
-    await callback.message.edit_text(
-        WELCOME_TEXT,
-        reply_markup=main_menu(),
-        parse_mode="HTML"
-    )
@@ -1,25 +1,175 @@
-import http.server
-import socketserver
-import threading
+import asyncio
+import json
 import os
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/health' or self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'OK')
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-def start_health_check():
-    port = int(os.getenv("PORT", 8080))
-    with socketserver.TCPServer(("", port), HealthCheckHandler) as httpd:
-        print(f"✅ Health check сервер запущен на порту {port}")
-        httpd.serve_forever()
-
-def run_health_check():
-    thread = threading.Thread(target=start_health_check, daemon=True)
-    thread.start()
+from aiohttp import web
+
+from config import (
+    HEALTH_PROBE_INTERVAL, HEALTH_MAX_LOOP_LAG_MS, HEALTH_MAX_DB_RTT_MS,
+    HEALTH_MAX_QUEUE_DEPTH, HEALTH_MAX_UPDATE_AGE
+)
+from utils.metrics import CONTENT_TYPE, metrics
+
+# Шаг замера отставания цикла событий, секунды
+LAG_TICK = 0.5
+# Замер отставания не обновлялся дольше - процесс считается зависшим
+LIVENESS_STALL = 10.0
+
+
+def _check(value: Optional[float], limit: Optional[float]) -> Dict[str, Any]:
+    """Одна проверка готовности; limit=None - только показываем значение"""
+    ok = limit is None or (value is not None and value <= limit)
+    return {"value": None if value is None else round(value, 3), "limit": limit, "ok": ok}
+
+
+class HealthMonitor:
+    """Живость и готовность процесса по реальным замерам.
+
+    Фоновые задачи в том же цикле событий меряют его отставание и время
+    проверочного чтения БД. Живость - цикл событий крутится (иначе
+    платформе пора перезапустить процесс). Готовность - все замеры в
+    пределах порогов (иначе экземпляр стоит снять с трафика).
+    """
+
+    def __init__(self, db, probe_interval: float = HEALTH_PROBE_INTERVAL,
+                 max_loop_lag_ms: float = HEALTH_MAX_LOOP_LAG_MS, max_db_rtt_ms: float = HEALTH_MAX_DB_RTT_MS,
+                 max_queue_depth: int = HEALTH_MAX_QUEUE_DEPTH, max_update_age: float = HEALTH_MAX_UPDATE_AGE):
+        self.db = db
+        self.probe_interval = probe_interval
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.max_db_rtt_ms = max_db_rtt_ms
+        self.max_queue_depth = max_queue_depth
+        self.max_update_age = max_update_age or None
+
+        # Очереди процесса: имя -> функция, возвращающая текущую глубину
+        self.queues: Dict[str, Callable[[], int]] = {}
+
+        self.started = time.monotonic()
+        self.loop_lag = 0.0
+        self.db_rtt: Optional[float] = None
+        self.db_error: Optional[str] = None
+        self.last_update: Optional[float] = None
+        self._last_tick: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._tasks: List[asyncio.Task] = []
+
+        metrics.collector(self._metrics)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._lag_loop()), asyncio.create_task(self._probe_loop())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def mark_update(self):
+        """Апдейт обработан (вызывает middleware диспетчера)"""
+        self.last_update = time.monotonic()
+
+    async def _lag_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_TICK)
+            self._last_tick = loop.time()
+            self.loop_lag = max(0.0, self._last_tick - started - LAG_TICK)
+
+    async def _probe_loop(self):
+        while True:
+            await self.probe_db()
+            await asyncio.sleep(self.probe_interval)
+
+    async def probe_db(self):
+        """Проверочная транзакция БД через общий пул потоков"""
+        self._probe_started = time.perf_counter()
+        try:
+            await self.db.ping()
+            self.db_error = None
+        except Exception as e:
+            self.db_error = str(e)
+        finally:
+            self.db_rtt = time.perf_counter() - self._probe_started
+            self._probe_started = None
+
+    def _current_db_rtt(self) -> Optional[float]:
+        # Зависшая проверка видна сразу, а не после ее завершения
+        if self._probe_started is not None:
+            return max(self.db_rtt or 0.0, time.perf_counter() - self._probe_started)
+        return self.db_rtt
+
+    def _update_age(self) -> float:
+        return time.monotonic() - (self.last_update or self.started)
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        now = asyncio.get_running_loop().time()
+        stalled = now - self._last_tick if self._last_tick is not None else time.monotonic() - self.started
+        alive = stalled <= LIVENESS_STALL
+        return alive, {
+            "alive": alive,
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "lag_sample_age_s": round(stalled, 1),
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        db_rtt = self._current_db_rtt()
+        checks = {
+            "loop_lag_ms": _check(self.loop_lag * 1000, self.max_loop_lag_ms),
+            # До первой проверки БД экземпляр не готов
+            "db_rtt_ms": _check(None if db_rtt is None else db_rtt * 1000, self.max_db_rtt_ms),
+            "last_update_age_s": _check(self._update_age(), self.max_update_age),
+        }
+        if self.db_error:
+            checks["db_rtt_ms"].update(ok=False, error=self.db_error)
+        for name, depth in self.queues.items():
+            checks[f"queue_{name}"] = _check(depth(), self.max_queue_depth)
+
+        failed = [name for name, check in checks.items() if not check["ok"]]
+        return not failed, {"ready": not failed, "failed": failed, "checks": checks}
+
+    def _metrics(self):
+        db_rtt = self._current_db_rtt()
+        yield ("bot_event_loop_lag_seconds", "gauge", "Отставание цикла событий", [({}, self.loop_lag)])
+        if db_rtt is not None:
+            yield ("bot_db_ping_seconds", "gauge", "Время проверочного чтения БД", [({}, db_rtt)])
+        yield ("bot_last_update_age_seconds", "gauge", "Секунды с последнего обработанного апдейта",
+               [({}, self._update_age())])
+        yield ("bot_ready", "gauge", "Готовность экземпляра принимать трафик", [({}, int(self.readiness()[0]))])
+
+
+_dumps = partial(json.dumps, ensure_ascii=False)
+
+
+def add_health_routes(app: web.Application, monitor: HealthMonitor):
+    """/health и /live - живость, /ready - готовность, /metrics - метрики Prometheus"""
+
+    async def live(request: web.Request) -> web.Response:
+        alive, body = monitor.liveness()
+        return web.json_response(body, status=200 if alive else 503, dumps=_dumps)
+
+    async def ready(request: web.Request) -> web.Response:
+        is_ready, body = monitor.readiness()
+        return web.json_response(body, status=200 if is_ready else 503, dumps=_dumps)
+
+    async def metrics_view(request: web.Request) -> web.Response:
+        return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app.router.add_get("/", live)
+    app.router.add_get("/health", live)
+    app.router.add_get("/live", live)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/metrics", metrics_view)
+
+
+async def start_http_server(app: web.Application, port: int = None) -> web.AppRunner:
+    """Поднимаем aiohttp-приложение на $PORT в текущем цикле событий"""
+    port = port or int(os.getenv("PORT", 8080))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    print(f"✅ Health check сервер запущен на порту {port}")
+    return runner
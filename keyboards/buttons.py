@@ -1,7 +1,15 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from keyboards.callback_data import (
+    ADMIN_CONFIRM, ADMIN_REJECT, ADMIN_WITHDRAW_CONFIRM, ADMIN_WITHDRAW_REJECT,
+    APPLY_PROMO, BUY, CASE, OPEN_CASE, PAID, PAY_CARD, PAY_STARS, RATE, SELL
+)
+from utils.catalog import get_catalog
+from utils.render_cache import cached_screen
 
+
+@cached_screen("main_menu")
 def main_menu() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.row(
@@ -25,15 +33,15 @@ def back_to_menu() -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
+@cached_screen("cases_menu")
 def cases_menu() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
-    from config import CASES
 
-    for case_id, case_data in CASES.items():
+    for case_id, case_data in get_catalog().cases.items():
         kb.row(
             InlineKeyboardButton(
-                text=f"{case_data['name']} - {case_data['price']}₽",
-                callback_data=f"case_{case_id}"
+                text=case_data['menu_label'],
+                callback_data=CASE.pack(case_id=case_id)
             )
         )
 
@@ -41,30 +49,32 @@ def cases_menu() -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
+@cached_screen("case_detail_menu")
 def case_detail_menu(case_id: int) -> InlineKeyboardMarkup:
     """Меню деталей кейса"""
     kb = InlineKeyboardBuilder()
     kb.row(
-        InlineKeyboardButton(text="💰 Купить", callback_data=f"buy_{case_id}"),
-        InlineKeyboardButton(text="🎟 Применить промокод", callback_data=f"apply_promo_{case_id}")
+        InlineKeyboardButton(text="💰 Купить", callback_data=BUY.pack(case_id=case_id)),
+        InlineKeyboardButton(text="🎟 Применить промокод", callback_data=APPLY_PROMO.pack(case_id=case_id))
     )
     kb.row(InlineKeyboardButton(text="◀️ Назад к кейсам", callback_data="cases"))
     return kb.as_markup()
 
 
+@cached_screen("payment_methods_menu")
 def payment_methods_menu(case_id: int, has_used_promo: bool = False):
     """Клавиатура методов оплаты"""
     kb = InlineKeyboardBuilder()
 
     kb.row(
-        InlineKeyboardButton(text="💳 Карта", callback_data=f"pay_card_{case_id}"),
-        InlineKeyboardButton(text="⭐ Звёзды", callback_data=f"pay_stars_{case_id}")
+        InlineKeyboardButton(text="💳 Карта", callback_data=PAY_CARD.pack(case_id=case_id)),
+        InlineKeyboardButton(text="⭐ Звёзды", callback_data=PAY_STARS.pack(case_id=case_id))
     )
 
     if not has_used_promo:
-        kb.row(InlineKeyboardButton(text="🎟 Применить промокод", callback_data=f"apply_promo_{case_id}"))
+        kb.row(InlineKeyboardButton(text="🎟 Применить промокод", callback_data=APPLY_PROMO.pack(case_id=case_id)))
 
-    kb.row(InlineKeyboardButton(text="◀️ Назад", callback_data=f"case_{case_id}"))
+    kb.row(InlineKeyboardButton(text="◀️ Назад", callback_data=CASE.pack(case_id=case_id)))
 
     return kb.as_markup()
 
@@ -72,7 +82,7 @@ def payment_methods_menu(case_id: int, has_used_promo: bool = False):
 def confirm_payment_menu(order_id: int) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.row(
-        InlineKeyboardButton(text="✅ Я оплатил", callback_data=f"paid_{order_id}"),
+        InlineKeyboardButton(text="✅ Я оплатил", callback_data=PAID.pack(order_id=order_id)),
         InlineKeyboardButton(text="❌ Отмена", callback_data="cases")
     )
     return kb.as_markup()
@@ -82,8 +92,8 @@ def admin_order_menu(order_id: int, user_id: int) -> InlineKeyboardMarkup:
     """Меню заказа для админа"""
     kb = InlineKeyboardBuilder()
     kb.row(
-        InlineKeyboardButton(text="✅ Подтвердить", callback_data=f"admin_confirm_{order_id}"),
-        InlineKeyboardButton(text="❌ Отклонить", callback_data=f"admin_reject_{order_id}")
+        InlineKeyboardButton(text="✅ Подтвердить", callback_data=ADMIN_CONFIRM.pack(order_id=order_id)),
+        InlineKeyboardButton(text="❌ Отклонить", callback_data=ADMIN_REJECT.pack(order_id=order_id))
     )
     kb.row(
         InlineKeyboardButton(text="👤 Профиль", url=f"tg://user?id={user_id}"),
@@ -96,8 +106,8 @@ def admin_withdrawal_menu(withdrawal_id: int, user_id: int) -> InlineKeyboardMar
     """Меню вывода для админа"""
     kb = InlineKeyboardBuilder()
     kb.row(
-        InlineKeyboardButton(text="✅ Выплачено", callback_data=f"admin_withdraw_confirm_{withdrawal_id}"),
-        InlineKeyboardButton(text="❌ Отклонить", callback_data=f"admin_withdraw_reject_{withdrawal_id}")
+        InlineKeyboardButton(text="✅ Выплачено", callback_data=ADMIN_WITHDRAW_CONFIRM.pack(withdrawal_id=withdrawal_id)),
+        InlineKeyboardButton(text="❌ Отклонить", callback_data=ADMIN_WITHDRAW_REJECT.pack(withdrawal_id=withdrawal_id))
     )
     kb.row(
         InlineKeyboardButton(text="👤 Профиль", url=f"tg://user?id={user_id}"),
@@ -127,7 +137,7 @@ def inventory_menu(items: list) -> InlineKeyboardMarkup:
         kb.row(
             InlineKeyboardButton(
                 text=f"{item['item_name']} - {item['item_price']}G",
-                callback_data=f"open_{item['id']}"
+                callback_data=OPEN_CASE.pack(inventory_id=item['id'])
             )
         )
 
@@ -141,7 +151,7 @@ def inventory_menu(items: list) -> InlineKeyboardMarkup:
 def item_action_menu(item_id: int, item_price: float) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.row(
-        InlineKeyboardButton(text="💰 Продать", callback_data=f"sell_{item_id}"),
+        InlineKeyboardButton(text="💰 Продать", callback_data=SELL.pack(stack_id=item_id)),
         InlineKeyboardButton(text="💾 Оставить", callback_data="inventory")
     )
     kb.row(InlineKeyboardButton(text="◀️ В инвентарь", callback_data="inventory"))
@@ -151,7 +161,7 @@ def item_action_menu(item_id: int, item_price: float) -> InlineKeyboardMarkup:
 def review_menu() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     for i in range(1, 6):
-        kb.button(text="⭐" * i, callback_data=f"rate_{i}")
+        kb.button(text="⭐" * i, callback_data=RATE.pack(rating=i))
     kb.row(InlineKeyboardButton(text="◀️ Пропустить", callback_data="menu"))
     return kb.as_markup()
 
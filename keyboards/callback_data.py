@@ -0,0 +1,41 @@
+from utils.callback_router import Int, Str, Token, callbacks
+
+
+# Опкоды callback_data с аргументами. Фильтр одновременно ловит нажатие
+# в обработчике и собирает данные для кнопки: CASE.pack(case_id=3) -> "1c:3".
+# Опкод нельзя переиспользовать под другие аргументы - для этого поднимается
+# CALLBACK_VERSION. Статические экраны ("menu", "inventory") остаются callbacks.exact.
+
+# Кейсы и оплата
+CASE = callbacks.route("c", case_id=Int())
+BUY = callbacks.route("b", case_id=Int())
+PAY_CARD = callbacks.route("pc", case_id=Int())
+PAY_STARS = callbacks.route("ps", case_id=Int())
+APPLY_PROMO = callbacks.route("ap", case_id=Int())
+PAID = callbacks.route("pd", order_id=Int())
+
+# Инвентарь
+INVENTORY_PAGE = callbacks.route("i", rarity=Str(), cursor=Token())
+OPEN_CASE = callbacks.route("o", inventory_id=Int())
+# limit=None - открыть все кейсы
+OPEN_CASES = callbacks.route("oa", limit=Int())
+ITEM = callbacks.route("it", stack_id=Int())
+SELL = callbacks.route("s", stack_id=Int())
+SELL_WON = callbacks.route("sw", stack_id=Int())
+# kind: price|rarity, value: порог цены или редкость
+BULK_SELL = callbacks.route("bs", kind=Str(), value=Str())
+BULK_SOLD = callbacks.route("bk", kind=Str(), value=Str())
+AUTO_SELL = callbacks.route("as", kind=Str(), value=Str())
+
+# Отзывы
+RATE = callbacks.route("r", rating=Int())
+
+# Админка
+ADMIN_CONFIRM = callbacks.route("ac", order_id=Int())
+ADMIN_REJECT = callbacks.route("ar", order_id=Int())
+ADMIN_WITHDRAW_CONFIRM = callbacks.route("wc", withdrawal_id=Int())
+ADMIN_WITHDRAW_REJECT = callbacks.route("wr", withdrawal_id=Int())
+# Промокод - буквы и цифры (проверка в admin_add_promo_finish), едет в кнопке как есть:
+# токен в памяти терялся бы при рестарте, и кнопки списка переставали работать
+ADMIN_DELETE_PROMO = callbacks.route("px", promo_code=Str())
+ADMIN_TOGGLE_PROMO = callbacks.route("pt", promo_code=Str(), status=Int())
@@ -3,10 +3,6 @@ import logging
 import os
 import sys
 
-# ЗАПУСКАЕМ HEALTH CHECK ИЗ ОТДЕЛЬНОГО ФАЙЛА
-from health_check import run_health_check
-run_health_check()
-
 # ========== ОРИГИНАЛЬНЫЙ КОД ТВОЕГО БОТА ==========
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -22,6 +18,9 @@ except ImportError:
     ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS", "").split(","))) if os.getenv("ADMIN_IDS") else []
     CASES = {}
 
+from config import BALANCE_SNAPSHOT_INTERVAL
+from config import WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+
 # Импортируем роутеры
 from handlers.start import router as start_router
 from handlers.cases import router as cases_router
@@ -33,8 +32,21 @@ from handlers.promo import router as promo_router
 from handlers.reviews import router as reviews_router
 from handlers.commands import router as commands_router
 
-from database.db import Database
-db = Database()
+from aiohttp import web
+
+from database.async_db import AsyncDatabase
+from health_check import HealthMonitor, add_health_routes, start_http_server
+from middlewares.callback_router import CallbackRouteMiddleware
+from middlewares.health import LastUpdateMiddleware
+from middlewares.metrics import BotApiMetricsMiddleware, HandlerMetricsMiddleware
+from middlewares.unit_of_work import UnitOfWorkMiddleware
+from utils.animation import animations
+from utils.callback_router import callbacks
+from utils.catalog import get_catalog
+from utils.metrics import metrics, stats_samples
+from utils.render_cache import render_cache
+from webhook import WebhookServer, webhook_secret
+db = AsyncDatabase()
 
 # Настройка логирования
 logging.basicConfig(
@@ -45,6 +57,31 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@metrics.collector
+def runtime_metrics():
+    """Статистика пула, очередей и кешей на момент запроса /metrics"""
+    yield from stats_samples("bot_db_pool", db.sync.pool_stats(), counters=("hits", "misses", "waits", "discarded"))
+    yield ("bot_db_executor_pending", "gauge", "Запросы к БД в ожидании потока", [({}, db.pending())])
+    yield from stats_samples("bot_render_cache", render_cache.stats(),
+                             counters=("hits", "misses", "invalidations"))
+    yield from stats_samples("bot_animation", animations.stats(),
+                             counters=("frames_sent", "frames_dropped", "errors"))
+    yield ("bot_callback_route_calls_total", "counter", "Нажатия по маршрутам callback_data",
+           [({"route": route}, stat["calls"]) for route, stat in callbacks.stats().items()])
+
+
+async def balance_snapshots_loop():
+    """Периодически снимаем остатки, чтобы сверка читала только свежие записи журнала"""
+    while True:
+        await asyncio.sleep(BALANCE_SNAPSHOT_INTERVAL)
+        try:
+            taken = await db.take_balance_snapshots()
+            logger.info(f"✅ Снимки балансов: {taken}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка снимка балансов: {e}")
+
+
 async def main():
     """Основная функция запуска бота"""
     if not BOT_TOKEN:
@@ -58,6 +95,7 @@ async def main():
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    bot.session.middleware(BotApiMetricsMiddleware())
 
     # Инициализируем диспетчер
     dp = Dispatcher(storage=MemoryStorage())
@@ -78,21 +116,75 @@ async def main():
     for router in routers:
         dp.include_router(router)
 
+    # callback_data разбирается один раз по префиксному дереву маршрутов
+    route_problems = callbacks.compile()
+    for problem in route_problems:
+        logger.error(f"❌ Маршрут callback: {problem}")
+    if not route_problems:
+        logger.info(f"✅ Маршруты callback: {len(callbacks)}")
+    dp.callback_query.outer_middleware(CallbackRouteMiddleware(callbacks))
+
+    # Метрики обработчиков снаружи транзакции - в задержку входит и коммит,
+    # одна транзакция БД на апдейт (общий экземпляр - общий лимит соединений)
+    handler_metrics = HandlerMetricsMiddleware()
+    unit_of_work = UnitOfWorkMiddleware(db)
+    for observer in (dp.message, dp.callback_query, dp.pre_checkout_query):
+        observer.middleware(handler_metrics)
+        observer.middleware(unit_of_work)
+
+    # Собираем каталог заранее: ошибка в файле кейсов видна сразу при старте
+    catalog = get_catalog()
+    logger.info(f"✅ Каталог загружен: {len(catalog)} кейсов, версия {catalog.version}")
+
     # Проверяем подключение к БД
     try:
-        test_user = db.get_user(1)
+        test_user = await db.get_user(1)
         logger.info("✅ База данных подключена")
     except Exception as e:
         logger.error(f"❌ Ошибка подключения к БД: {e}")
 
+    snapshots_task = asyncio.create_task(balance_snapshots_loop())
+
+    # Живость и готовность: отставание цикла событий, БД, очереди, свежесть апдейтов
+    monitor = HealthMonitor(db)
+    monitor.queues["animation_frames"] = lambda: animations.stats()["pending_frames"]
+    monitor.queues["db_executor"] = db.pending
+    dp.update.outer_middleware(LastUpdateMiddleware(monitor))
+    monitor.start()
+
     logger.info("🤖 Бот запущен и готов к работе!")
 
+    webhook = None
+    health_runner = None
     try:
-        await dp.start_polling(bot, skip_updates=True)
+        if WEBHOOK_URL:
+            webhook = WebhookServer(
+                dp, bot, monitor,
+                secret=webhook_secret(BOT_TOKEN, WEBHOOK_SECRET),
+                queue_size=WEBHOOK_QUEUE_SIZE,
+                workers=WEBHOOK_WORKERS
+            )
+            await webhook.start(WEBHOOK_URL)
+            logger.info("📡 Режим приема апдейтов: webhook")
+            await asyncio.Event().wait()
+        else:
+            health_app = web.Application()
+            add_health_routes(health_app, monitor)
+            health_runner = await start_http_server(health_app)
+            # Вебхук, оставшийся от прошлого запуска, не дал бы получать апдейты
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("📡 Режим приема апдейтов: polling")
+            await dp.start_polling(bot, skip_updates=True)
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")
         raise
     finally:
+        if webhook is not None:
+            await webhook.stop()
+        if health_runner is not None:
+            await health_runner.cleanup()
+        await monitor.stop()
+        snapshots_task.cancel()
         await bot.session.close()
         logger.info("👋 Бот завершил работу")
 
@@ -0,0 +1,39 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from utils.callback_router import CallbackRoutes
+
+
+class CallbackRouteMiddleware(BaseMiddleware):
+    """Разбираем callback_data один раз на апдейт (outer middleware на dp.callback_query).
+
+    Найденный маршрут кладется в data["callback_route"] для фильтров
+    callbacks.route(...); время обработки записывается по маршруту.
+    Нераспознанная callback_data до обработчиков не доходит.
+    """
+
+    def __init__(self, routes: CallbackRoutes):
+        self.routes = routes
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        resolved = self.routes.resolve(event.data)
+        if resolved is None:
+            # Кнопка старой версии формата или с вытесненным токеном
+            self.routes.record(None, 0.0)
+            await event.answer("⚠️ Кнопка устарела, откройте меню заново")
+            return None
+        data["callback_route"] = resolved
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.routes.record(resolved[0], time.perf_counter() - started)
@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from health_check import HealthMonitor
+
+
+class LastUpdateMiddleware(BaseMiddleware):
+    """Отмечаем время последнего обработанного апдейта (outer middleware на dp.update)"""
+
+    def __init__(self, monitor: HealthMonitor):
+        self.monitor = monitor
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            self.monitor.mark_update()
@@ -0,0 +1,61 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject
+
+from utils.metrics import API_ERRORS, API_LATENCY, HANDLER_ERRORS, HANDLER_IN_FLIGHT, HANDLER_LATENCY
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Задержка, ошибки и число апдейтов в работе по обработчикам.
+
+    Вешается как внутренний middleware на наблюдатели диспетчера: такие
+    middleware наследуют все дочерние роутеры, и к этому моменту уже
+    известен выбранный обработчик (data["handler"]).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = data["handler"].callback
+        labels = {
+            "router": callback.__module__.rpartition(".")[2],
+            "handler": callback.__name__,
+        }
+
+        HANDLER_IN_FLIGHT.inc(**labels)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(**labels)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, **labels)
+            HANDLER_IN_FLIGHT.dec(**labels)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки запросов к Bot API (bot.session.middleware)"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod
+    ):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(method=name)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, method=name)
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+from database.async_db import AsyncDatabase
+from database.unit_of_work import UnitOfWork
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Единица работы на каждый апдейт: все вызовы db внутри обработчика
+    идут через одно соединение и фиксируются одним коммитом в конце
+    (или откатываются, если обработчик упал).
+
+    Обработчик может получить ее аргументом `uow: UnitOfWork`.
+    Флаг flags={"unit_of_work": False} отключает middleware для обработчика.
+    """
+
+    def __init__(self, db: AsyncDatabase, max_open: int = None):
+        self.db = db
+        # Одно соединение пула оставляем для запросов вне единиц работы
+        # (фоновые задачи, проверка готовности), иначе возможна взаимоблокировка
+        self.max_open = max_open or max(1, db.sync.pool.max_size - 1)
+        self._slots = asyncio.Semaphore(self.max_open)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if get_flag(data, "unit_of_work") is False:
+            return await handler(event, data)
+
+        uow = UnitOfWork(self.db, self._slots)
+        data["uow"] = uow
+        token = uow.bind()
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await uow.rollback()
+            raise
+        else:
+            await uow.commit()
+            return result
+        finally:
+            UnitOfWork.unbind(token)
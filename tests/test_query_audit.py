@@ -0,0 +1,6 @@
+from database.query_audit import run_audit
+
+
+def test_query_plans_have_no_scans_or_temp_btrees():
+    """Каждый запрос Database идет по индексу и не сортирует через временное B-дерево"""
+    assert run_audit() == []
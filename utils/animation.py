@@ -0,0 +1,189 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import ANIMATION_TICK, ANIMATION_GLOBAL_RATE, ANIMATION_CHAT_INTERVAL
+
+
+class Frame:
+    """Кадр анимации: действие (edit_text, send_dice...) через offset секунд от старта.
+
+    droppable=True - промежуточный кадр: если анимация отстает, его можно
+    пропустить в пользу следующего. Обязательные кадры отправляются всегда.
+    """
+
+    __slots__ = ("offset", "action", "droppable")
+
+    def __init__(self, offset: float, action: Callable[[], Awaitable[Any]], droppable: bool = True):
+        self.offset = offset
+        self.action = action
+        self.droppable = droppable
+
+
+class Animation:
+    __slots__ = ("chat_id", "frames", "order", "duration", "started", "next_index",
+                 "pending", "sending", "results", "done")
+
+    def __init__(self, chat_id: int, frames: List[Frame], duration: float, started: float,
+                 done: asyncio.Future):
+        self.chat_id = chat_id
+        self.frames = frames
+        self.order = sorted(range(len(frames)), key=lambda i: frames[i].offset)
+        self.duration = duration
+        self.started = started
+        self.next_index = 0
+        self.pending: List[int] = []  # индексы кадров, которые пора отправить
+        self.sending = False
+        self.results: List[Any] = [None] * len(frames)
+        self.done = done
+
+
+class AnimationScheduler:
+    """Единый планировщик анимаций открытия кейсов.
+
+    Вместо корутины со sleep() на каждое открытие - один тикер, который
+    продвигает все анимации и отправляет кадры с учетом общего лимита
+    Telegram (ANIMATION_GLOBAL_RATE в секунду) и лимита на чат
+    (не чаще раза в ANIMATION_CHAT_INTERVAL). Если кадры не успевают уйти,
+    промежуточные склеиваются: отправляется только самый свежий.
+    """
+
+    def __init__(self, tick: float = 0.1, global_rate: float = 25, chat_interval: float = 1.0):
+        self.tick = tick
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+
+        self._animations: List[Animation] = []
+        self._chat_last_sent: Dict[int, float] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        # Запас токенов не больше, чем на один тик - без всплесков в начале секунды
+        self._capacity = max(1.0, global_rate * tick)
+        self._tokens = self._capacity
+        self._refilled = 0.0
+
+        # Метрики
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.errors = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    async def play(self, chat_id: int, frames: List[Frame], duration: float = None) -> List[Any]:
+        """Проигрываем анимацию и ждем ее окончания.
+
+        Возвращает результаты кадров в исходном порядке (None - кадр пропущен или упал).
+        """
+        loop = asyncio.get_running_loop()
+        if duration is None:
+            duration = max((f.offset for f in frames), default=0)
+
+        animation = Animation(chat_id, frames, duration, loop.time(), loop.create_future())
+        self._animations.append(animation)
+
+        if self._ticker is None or self._ticker.done():
+            self._refilled = loop.time()
+            # Тикер и кадры общие для всех обработчиков: чистый контекст, чтобы
+            # они не унаследовали единицу работы апдейта, запустившего тикер
+            self._ticker = loop.create_task(self._run(), context=contextvars.Context())
+
+        await animation.done
+        return animation.results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._animations:
+            now = loop.time()
+            self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self.global_rate)
+            self._refilled = now
+
+            # Сначала обслуживаем самые отстающие анимации
+            for animation in sorted(self._animations, key=lambda a: self._oldest_due(a, now)):
+                self._advance(animation, now)
+
+            self._prune_chats(now)
+            await asyncio.sleep(self.tick)
+
+    def _oldest_due(self, animation: Animation, now: float) -> float:
+        if animation.pending:
+            return animation.started + animation.frames[animation.pending[0]].offset
+        return now
+
+    def _advance(self, animation: Animation, now: float):
+        # Переносим наступившие кадры в очередь, склеивая промежуточные
+        while animation.next_index < len(animation.order):
+            index = animation.order[animation.next_index]
+            frame = animation.frames[index]
+            if animation.started + frame.offset > now:
+                break
+            if (frame.droppable and animation.pending
+                    and animation.frames[animation.pending[-1]].droppable):
+                animation.pending[-1] = index
+                self.frames_dropped += 1
+            else:
+                animation.pending.append(index)
+            animation.next_index += 1
+
+        if animation.pending and not animation.sending and self._tokens >= 1:
+            last_sent = self._chat_last_sent.get(animation.chat_id, 0.0)
+            if now - last_sent >= self.chat_interval:
+                index = animation.pending.pop(0)
+                self._tokens -= 1
+                self._chat_last_sent[animation.chat_id] = now
+                animation.sending = True
+                asyncio.get_running_loop().create_task(
+                    self._send(animation, index, now), context=contextvars.Context()
+                )
+
+        finished = (
+            animation.next_index == len(animation.order)
+            and not animation.pending
+            and not animation.sending
+            and now >= animation.started + animation.duration
+        )
+        if finished:
+            self._animations.remove(animation)
+            if not animation.done.done():
+                animation.done.set_result(None)
+
+    async def _send(self, animation: Animation, index: int, now: float):
+        frame = animation.frames[index]
+        lag = max(0.0, now - (animation.started + frame.offset))
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        try:
+            animation.results[index] = await frame.action()
+            self.frames_sent += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Ошибка кадра анимации в чате {animation.chat_id}: {e}")
+        finally:
+            animation.sending = False
+
+    def _prune_chats(self, now: float):
+        # Чаты без свежих отправок больше не ограничены - не храним их
+        if len(self._chat_last_sent) > 1000:
+            self._chat_last_sent = {
+                chat_id: sent for chat_id, sent in self._chat_last_sent.items()
+                if now - sent < self.chat_interval
+            }
+
+    def stats(self) -> Dict[str, float]:
+        """Сколько анимаций в работе и насколько они отстают от расписания"""
+        now = time.monotonic()  # то же время, что loop.time() у стандартного цикла asyncio
+        lags = [now - self._oldest_due(a, now) for a in self._animations if a.pending]
+        sent = self.frames_sent + self.errors
+        return {
+            "in_flight": len(self._animations),
+            "pending_frames": sum(len(a.pending) for a in self._animations),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "errors": self.errors,
+            "current_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+            "avg_lag_ms": round(self.lag_total / sent * 1000, 1) if sent else 0.0,
+            "max_lag_ms": round(self.lag_max * 1000, 1),
+        }
+
+
+# Общий планировщик для всех обработчиков
+animations = AnimationScheduler(ANIMATION_TICK, ANIMATION_GLOBAL_RATE, ANIMATION_CHAT_INTERVAL)
@@ -0,0 +1,306 @@
+import base64
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+
+
+# Формат callback_data: <версия><опкод>:<арг>:<арг>...
+# Версию поднимаем при несовместимом изменении аргументов - старые кнопки
+# перестанут разбираться (пользователь увидит "кнопка устарела"), а не разберутся неверно
+CALLBACK_VERSION = "1"
+CALLBACK_SEP = ":"
+# Лимит Telegram на callback_data
+CALLBACK_DATA_LIMIT = 64
+
+
+class CallbackDataError(ValueError):
+    """callback_data нельзя собрать: не влезает в лимит или значение некорректно"""
+
+
+class Field(ABC):
+    """Тип аргумента callback_data. None кодируется пустой строкой."""
+
+    def encode(self, value: Any) -> str:
+        return "" if value is None else self._encode(value)
+
+    def decode(self, raw: str) -> Any:
+        return None if raw == "" else self._decode(raw)
+
+    @abstractmethod
+    def _encode(self, value: Any) -> str:
+        ...
+
+    @abstractmethod
+    def _decode(self, raw: str) -> Any:
+        ...
+
+
+class Int(Field):
+    """Неотрицательное целое в base36"""
+
+    DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+    def _encode(self, value: int) -> str:
+        value = int(value)
+        if value < 0:
+            raise CallbackDataError(f"отрицательное число в callback_data: {value}")
+        digits = ""
+        while True:
+            value, rest = divmod(value, 36)
+            digits = self.DIGITS[rest] + digits
+            if not value:
+                return digits
+
+    def _decode(self, raw: str) -> int:
+        return int(raw, 36)
+
+
+class Str(Field):
+    """Короткая строка как есть (редкость, вид фильтра)"""
+
+    def _encode(self, value: str) -> str:
+        value = str(value)
+        if CALLBACK_SEP in value:
+            raise CallbackDataError(f"разделитель в строковом аргументе: {value!r}")
+        return value
+
+    def _decode(self, raw: str) -> str:
+        return raw
+
+
+class TokenStore:
+    """Значения, которые не должны ездить через клиента, хранятся на сервере.
+
+    Токен - короткий хеш значения, поэтому одна и та же страница дает один
+    и тот же токен. Хранилище в памяти и ограничено по размеру: после
+    рестарта или вытеснения кнопка с токеном считается устаревшей.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._values: "OrderedDict[str, str]" = OrderedDict()
+
+    def put(self, value: str) -> str:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=6).digest()
+        token = base64.urlsafe_b64encode(digest).decode("ascii")
+        self._values[token] = value
+        self._values.move_to_end(token)
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> str:
+        try:
+            return self._values[token]
+        except KeyError:
+            raise ValueError(f"неизвестный токен {token!r}") from None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+tokens = TokenStore()
+
+
+class Token(Field):
+    """Произвольная строка (курсор, промокод) по серверному токену"""
+
+    def _encode(self, value: str) -> str:
+        return tokens.put(str(value))
+
+    def _decode(self, raw: str) -> str:
+        return tokens.get(raw)
+
+
+_FIELD_TYPES: Dict[Any, Field] = {int: Int(), str: Str()}
+
+
+class Route:
+    """Маршрут callback_data: ключ (версия + опкод) и типизированные аргументы.
+
+    exact=True - callback_data должна совпасть с ключом целиком (без аргументов).
+    """
+
+    __slots__ = ("key", "params", "exact")
+
+    def __init__(self, key: str, params: Dict[str, Field], exact: bool = False):
+        self.key = key
+        self.params = params
+        self.exact = exact
+
+    def parse(self, rest: str) -> Optional[Dict[str, Any]]:
+        """Аргументы из остатка после ключа; None - данные не подходят маршруту"""
+        if self.exact or not self.params:
+            return {} if not rest else None
+        parts = rest.split(CALLBACK_SEP, len(self.params) - 1)
+        if len(parts) != len(self.params):
+            return None
+        try:
+            return {name: field.decode(part) for (name, field), part in zip(self.params.items(), parts)}
+        except ValueError:
+            return None
+
+    def encode(self, values: Dict[str, Any]) -> str:
+        unknown = set(values) - set(self.params)
+        if unknown:
+            raise CallbackDataError(f"{self!r}: лишние аргументы {sorted(unknown)}")
+        return self.key + CALLBACK_SEP.join(
+            field.encode(values.get(name)) for name, field in self.params.items()
+        )
+
+    def __repr__(self) -> str:
+        return f"{self.key!r}" if self.exact else f"{self.key!r}+{list(self.params)}"
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "exact")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.prefix: Optional[Route] = None
+        self.exact: Optional[Route] = None
+
+
+class CallbackRoutes:
+    """Реестр маршрутов callback_data, собранный в префиксное дерево.
+
+    Маршрут с аргументами объявляется через callbacks.route(опкод, имя=тип),
+    статический экран - через callbacks.exact(data). Возвращаемый фильтр
+    заодно собирает данные для кнопки: ROUTE.pack(имя=значение).
+    Middleware один раз на апдейт проходит по дереву и разбирает аргументы;
+    фильтры только сравнивают найденный маршрут со своим, поэтому результат
+    не зависит от порядка регистрации роутеров.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, bool], Route] = {}
+        self._registrations: Dict[Tuple[str, bool], int] = {}
+        self._root: Optional[_Node] = None
+
+        # Время обработки по маршрутам
+        self._timings: Dict[str, List[float]] = {}
+
+    def route(self, opcode: str, **params: Union[Field, type]) -> "RouteFilter":
+        """Маршрут с аргументами params (имя=Int()/Str()/Token() или int/str)"""
+        fields = {name: _FIELD_TYPES.get(kind, kind) for name, kind in params.items()}
+        return self._register(Route(f"{CALLBACK_VERSION}{opcode}{CALLBACK_SEP}", fields))
+
+    def exact(self, data: str) -> "RouteFilter":
+        """Статическая кнопка без аргументов: callback_data совпадает целиком"""
+        return self._register(Route(data, {}, exact=True))
+
+    def _register(self, route: Route) -> "RouteFilter":
+        key = (route.key, route.exact)
+        known = self._routes.setdefault(key, route)
+        self._registrations[key] = self._registrations.get(key, 0) + 1
+        self._root = None
+        return RouteFilter(self, known)
+
+    def compile(self) -> List[str]:
+        """Собираем дерево и возвращаем список неоднозначностей маршрутов"""
+        root = _Node()
+        for route in self._routes.values():
+            node = root
+            for char in route.key:
+                node = node.children.setdefault(char, _Node())
+            if route.exact:
+                node.exact = route
+            else:
+                node.prefix = route
+        self._root = root
+
+        problems = []
+        for (key, exact), count in self._registrations.items():
+            if count > 1:
+                kind = "значение" if exact else "опкод"
+                problems.append(f"{kind} {key!r} объявлен {count} раз(а)")
+
+        # Ключ маршрута с аргументами, с которого начинается другой ключ:
+        # какой обработчик сработает, решает только длина совпадения
+        for short in self._routes.values():
+            if short.exact:
+                continue
+            for long in self._routes.values():
+                if long is not short and long.key.startswith(short.key):
+                    problems.append(f"{short!r} перекрывает {long!r}")
+        return problems
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        """Маршрут и аргументы за один проход по callback_data"""
+        if data is None:
+            return None
+        if self._root is None:
+            self.compile()
+
+        node = self._root
+        candidates: List[Tuple[Route, int]] = []
+        for position, char in enumerate(data):
+            if node.prefix is not None:
+                candidates.append((node.prefix, position))
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            if node.exact is not None:
+                return node.exact, {}
+            if node.prefix is not None:
+                candidates.append((node.prefix, len(data)))
+
+        # Самый длинный ключ, чьи аргументы разобрались
+        for route, position in reversed(candidates):
+            args = route.parse(data[position:])
+            if args is not None:
+                return route, args
+        return None
+
+    def record(self, route: Optional[Route], elapsed: float):
+        name = route.key if route is not None else "<unmatched>"
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = [0, 0.0, 0.0]
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] = max(timing[2], elapsed)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Число вызовов, среднее и максимальное время обработки по маршрутам"""
+        return {
+            name: {
+                "calls": calls,
+                "avg_ms": round(total / calls * 1000, 3),
+                "max_ms": round(worst * 1000, 3),
+            }
+            for name, (calls, total, worst) in sorted(self._timings.items())
+        }
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+class RouteFilter(Filter):
+    """Срабатывает, если апдейт разрешился в этот маршрут; отдает аргументы обработчику"""
+
+    def __init__(self, routes: CallbackRoutes, route: Route):
+        self.routes = routes
+        self.route = route
+
+    def pack(self, **values: Any) -> str:
+        """callback_data для кнопки; не влезает в лимит Telegram - CallbackDataError"""
+        data = self.route.encode(values)
+        if len(data.encode("utf-8")) > CALLBACK_DATA_LIMIT:
+            raise CallbackDataError(f"callback_data длиннее {CALLBACK_DATA_LIMIT} байт: {data!r}")
+        return data
+
+    async def __call__(self, callback: CallbackQuery, callback_route=None) -> Any:
+        # Без middleware (например, отдельный роутер в тестах) разбираем сами
+        resolved = callback_route or self.routes.resolve(callback.data)
+        if resolved is None or resolved[0] is not self.route:
+            return False
+        return resolved[1] or True
+
+
+callbacks = CallbackRoutes()
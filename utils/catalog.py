@@ -0,0 +1,127 @@
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from config import CATALOG_DISCOUNT_TIERS, load_cases
+from utils.drop_sampler import DropSampler
+
+
+REQUIRED_CASE_FIELDS = ("name", "price", "stars", "price_gold", "items")
+REQUIRED_ITEM_FIELDS = ("name", "rarity", "chance", "price", "emoji")
+
+# Разделитель предметов в описании кейса
+ITEMS_SEPARATOR = "===========================\n"
+
+
+def validate_cases(cases: Dict[int, Dict[str, Any]]):
+    """Проверяем каталог целиком до того, как что-то подменять"""
+    if not cases:
+        raise ValueError("Каталог пуст")
+    for case_id, case in cases.items():
+        missing = [field for field in REQUIRED_CASE_FIELDS if field not in case]
+        if missing:
+            raise ValueError(f"Кейс {case_id}: нет полей {', '.join(missing)}")
+        if case["price"] < 0 or case["stars"] < 0:
+            raise ValueError(f"Кейс {case_id}: отрицательная цена")
+        for item in case["items"]:
+            missing = [field for field in REQUIRED_ITEM_FIELDS if field not in item]
+            if missing:
+                raise ValueError(f"Кейс {case_id}: у предмета нет полей {', '.join(missing)}")
+
+
+def discounted_price(case: Mapping[str, Any], discount: float) -> Dict[str, Any]:
+    """Цена кейса со скидкой: из заранее посчитанных уровней или на лету"""
+    tier = case["discounts"].get(discount)
+    if tier is not None:
+        return tier
+    return {"price": case["price"] * (1 - discount), "stars": int(case["stars"] * (1 - discount))}
+
+
+def _render_detail(case: Dict[str, Any]) -> str:
+    items_text = ITEMS_SEPARATOR.join(
+        f"{item['emoji']} {item['chance']}% — {item['name']}\n | {item['rarity']} | ~ {item['price']}G\n"
+        for item in case["items"]
+    )
+    return (
+        f"<b>{case['name']}</b>\n\n"
+        f"💰 Цена: <b>{case['price']}₽</b> или <b>{case['stars']} ⭐</b>\n\n"
+        f"📦 <b>Содержимое:</b>\n{items_text}\n"
+        f"Выберите действие:"
+    )
+
+
+def _build_view(case_id: int, case: Dict[str, Any], discount_tiers: Iterable[float]) -> Mapping[str, Any]:
+    view = dict(case)
+    view["id"] = case_id
+    view["items"] = tuple(MappingProxyType(dict(item)) for item in case["items"])
+    view["menu_label"] = f"{case['name']} - {case['price']}₽"
+    view["detail_text"] = _render_detail(case)
+    view["discounts"] = MappingProxyType({
+        discount: MappingProxyType({
+            "price": case["price"] * (1 - discount),
+            "stars": int(case["stars"] * (1 - discount)),
+        })
+        for discount in discount_tiers
+    })
+    return MappingProxyType(view)
+
+
+class Catalog:
+    """Неизменяемый снимок каталога кейсов.
+
+    Все производные значения (текст описания, подписи кнопок, цены со
+    скидкой, таблицы выпадения) считаются один раз при сборке. Обработчики
+    берут текущий снимок через get_catalog() и только читают его.
+    """
+
+    def __init__(self, cases: Dict[int, Dict[str, Any]], version: int = 1,
+                 discount_tiers: Iterable[float] = CATALOG_DISCOUNT_TIERS):
+        validate_cases(cases)
+        self.version = version
+        self.sampler = DropSampler(cases)
+        self.cases: Mapping[int, Mapping[str, Any]] = MappingProxyType({
+            case_id: _build_view(case_id, case, discount_tiers)
+            for case_id, case in cases.items()
+        })
+        # Редкости предметов от дешевых к дорогим - для фильтров инвентаря
+        min_prices: Dict[str, float] = {}
+        for case in cases.values():
+            for item in case['items']:
+                rarity = item['rarity']
+                min_prices[rarity] = min(item['price'], min_prices.get(rarity, item['price']))
+        self.rarities = tuple(sorted(min_prices, key=min_prices.get))
+
+    def get(self, case_id: int) -> Optional[Mapping[str, Any]]:
+        return self.cases.get(case_id)
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Текущий каталог (при первом обращении загружается из CASES_FILE)"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog(load_cases())
+    return _catalog
+
+
+def reload_catalog(path: str = None) -> Catalog:
+    """Перечитываем каталог и подменяем его одной операцией.
+
+    Новый снимок собирается и проверяется целиком; при ошибке
+    (битый JSON, шансы не дают 100) остается прежний каталог.
+    """
+    global _catalog
+    cases = load_cases(path)
+    with _catalog_lock:
+        version = _catalog.version + 1 if _catalog else 1
+        catalog = Catalog(cases, version)
+        _catalog = catalog
+    return catalog
@@ -0,0 +1,89 @@
+import random
+from typing import Any, Dict, List, Optional
+
+
+# Допустимая погрешность суммы шансов (шансы задаются дробями вроде 2.8 и 0.2)
+CHANCE_TOLERANCE = 1e-6
+
+
+class AliasTable:
+    """Таблица псевдонимов (метод Vose) для одного кейса.
+
+    Строится за O(n) один раз, после чего каждый выбор предмета стоит O(1):
+    одно случайное число, одно сравнение и обращение к массиву.
+    """
+
+    __slots__ = ("items", "prob", "alias", "size")
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self.size = len(items)
+        total = sum(item["chance"] for item in items)
+
+        # Нормируем веса так, чтобы средний был равен 1
+        scaled = [item["chance"] * self.size / total for item in items]
+        self.prob = [0.0] * self.size
+        self.alias = list(range(self.size))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+        # Остатки из-за погрешности округления - вероятность 1
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng: random.Random) -> Dict[str, Any]:
+        # Целая часть выбирает столбец, дробная - сам предмет или его псевдоним
+        u = rng.random() * self.size
+        column = int(u)
+        if u - column < self.prob[column]:
+            return self.items[column]
+        return self.items[self.alias[column]]
+
+
+def validate_case(case_id: int, case: Dict[str, Any]):
+    """Шансы предметов кейса должны быть неотрицательными и в сумме давать 100"""
+    items = case.get("items") or []
+    if not items:
+        raise ValueError(f"Кейс {case_id}: нет предметов")
+    for item in items:
+        if item["chance"] < 0:
+            raise ValueError(f"Кейс {case_id}: отрицательный шанс у «{item['name']}»")
+    total = sum(item["chance"] for item in items)
+    if abs(total - 100) > CHANCE_TOLERANCE:
+        raise ValueError(f"Кейс {case_id}: сумма шансов {total}, должна быть 100")
+
+
+class DropSampler:
+    """Выпадение предметов из кейсов по заранее собранным таблицам.
+
+    rng можно передать свой (например, random.Random(42)), чтобы
+    результаты были воспроизводимы в бенчмарках и проверках.
+    """
+
+    def __init__(self, cases: Dict[int, Dict[str, Any]], rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+        self.tables: Dict[int, AliasTable] = {}
+        for case_id, case in cases.items():
+            validate_case(case_id, case)
+            self.tables[case_id] = AliasTable(case["items"])
+
+    def draw(self, case_id: int, n: int = 1) -> List[Dict[str, Any]]:
+        """n предметов из кейса (копии, чтобы не менять каталог)"""
+        table = self.tables.get(case_id)
+        if table is None:
+            raise KeyError(f"Кейс {case_id} не найден")
+        rng = self.rng
+        return [dict(table.draw(rng)) for _ in range(n)]
+
+
+def get_sampler() -> DropSampler:
+    """Сэмплер текущего каталога (пересобирается вместе с ним, см. utils/catalog.py)"""
+    from utils.catalog import get_catalog
+    return get_catalog().sampler
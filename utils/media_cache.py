@@ -0,0 +1,70 @@
+import os
+from typing import Dict, Optional, Union
+
+from aiogram import Bot
+from aiogram.types import FSInputFile, Message
+
+from config import OPEN_ANIMATION_DIR
+from database.async_db import AsyncDatabase
+
+
+# Редкость предмета -> имя файла анимации (близкие редкости делят одну анимацию)
+RARITY_TIERS = {
+    "Common": "common",
+    "Uncommon": "uncommon",
+    "Rare": "rare",
+    "Epic": "epic",
+    "Mythical": "epic",
+    "Legendary": "legendary",
+    "Arcane": "legendary",
+}
+
+ANIMATION_EXTENSIONS = (".gif", ".mp4")
+
+
+class MediaCache:
+    """Отправка анимаций по file_id.
+
+    Файл загружается в Telegram один раз, полученный file_id сохраняется
+    в таблице media_cache и дальше отправляется вместо файла.
+    """
+
+    def __init__(self, db: AsyncDatabase, media_dir: str = OPEN_ANIMATION_DIR):
+        self.db = db
+        self.media_dir = media_dir
+        # key -> file_id; None - в БД file_id нет, файл еще не загружали
+        self._file_ids: Dict[str, Optional[str]] = {}
+
+    async def _file_id(self, key: str) -> Optional[str]:
+        if key not in self._file_ids:
+            self._file_ids[key] = await self.db.get_media_file_id(key)
+        return self._file_ids[key]
+
+    def _source(self, key: str) -> Optional[str]:
+        for ext in ANIMATION_EXTENSIONS:
+            path = os.path.join(self.media_dir, f"{key}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    async def has_animation(self, key: str) -> bool:
+        """Есть ли что отправлять: file_id в кеше или файл на диске"""
+        return await self._file_id(key) is not None or self._source(key) is not None
+
+    async def send_animation(self, bot: Bot, chat_id: int, key: str, **kwargs) -> Message:
+        """Отправляем анимацию key; при первой отправке загружаем файл и запоминаем file_id"""
+        file_id = await self._file_id(key)
+        animation: Union[str, FSInputFile] = file_id or FSInputFile(self._source(key))
+
+        message = await bot.send_animation(chat_id, animation, **kwargs)
+
+        if file_id is None:
+            media = message.animation or message.document
+            if media:
+                self._file_ids[key] = media.file_id
+                await self.db.set_media_file_id(key, media.file_id)
+        return message
+
+
+def rarity_animation_key(rarity: str) -> str:
+    return f"open_{RARITY_TIERS.get(rarity, 'common')}"
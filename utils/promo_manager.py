@@ -19,10 +19,7 @@ def apply_promo_code(user_id: int, code: str, purchase_amount: float) -> dict:
         return {"success": False, "message": "Промокод не найден или неактивен"}
 
     # Проверяем использовал ли уже пользователь этот промокод
-    import json
-    used_by = json.loads(promo.get('used_by', '[]'))
-
-    if str(user_id) in used_by:
+    if db.has_user_used_this_promo(user_id, code):
         return {"success": False, "message": "Вы уже использовали этот промокод"}
 
     # Применяем скидку
@@ -0,0 +1,79 @@
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from utils.catalog import get_catalog
+
+
+class RenderCache:
+    """Кеш готовых экранов: текст и/или InlineKeyboardMarkup по (экран, параметры).
+
+    Экраны каталога меняются только вместе с каталогом, поэтому кеш
+    целиком сбрасывается, когда меняется версия get_catalog().
+    Размер ограничен max_size (вытесняются давно не использованные).
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        version = get_catalog().version
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+        try:
+            value = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = build()
+        # None - экрана нет (например, неизвестный кейс), такое не храним
+        if value is not None:
+            self._entries[key] = value
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "catalog_version": self._version,
+        }
+
+
+render_cache = RenderCache()
+
+
+def cached_screen(screen: str):
+    """Кешируем результат функции-экрана по ее аргументам.
+
+    Результат отдается всем пользователям один и тот же - его нельзя изменять.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key: Tuple = (screen, args, tuple(sorted(kwargs.items())))
+            return render_cache.get(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
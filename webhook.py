@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+from typing import Optional, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from health_check import HealthMonitor, add_health_routes, start_http_server
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH_PREFIX = "/webhook/"
+
+WEBHOOK_UPDATES = metrics.counter(
+    "bot_webhook_updates_total", "Апдейты, пришедшие на вебхук", ("result",)
+)
+
+
+def webhook_secret(bot_token: str, secret: str = "") -> str:
+    """Секрет пути и заголовка X-Telegram-Bot-Api-Secret-Token.
+
+    Без явного WEBHOOK_SECRET выводим его из токена: он стабилен между
+    рестартами и не совпадает с самим токеном.
+    """
+    if secret:
+        return secret
+    return hashlib.sha256(f"webhook:{bot_token}".encode("utf-8")).hexdigest()[:32]
+
+
+class WebhookServer:
+    """Прием апдейтов через вебхук в одном цикле событий с /health, /ready и /metrics.
+
+    Обработчик вебхука только проверяет секрет и кладет апдейт в
+    ограниченную очередь - Telegram получает ответ сразу. При полной
+    очереди отвечаем 503: Telegram повторит доставку позже, а память не
+    растет без предела.
+
+    Каждый апдейт из очереди обрабатывается отдельной задачей, не больше
+    workers одновременно. Обработчик, который долго ждет (анимация
+    открытия кейса идет секунды), занимает только свой слот и не держит
+    остальные апдейты, как это было бы с фиксированным набором воркеров.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, monitor: HealthMonitor, secret: str,
+                 queue_size: int = 1000, workers: int = 256):
+        self.dp = dp
+        self.bot = bot
+        self.monitor = monitor
+        self.secret = secret
+        self.path = WEBHOOK_PATH_PREFIX + secret
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+
+        self._slots = asyncio.Semaphore(workers)
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+
+        metrics.collector(self._queue_metrics)
+        monitor.queues["webhook"] = self.queue.qsize
+
+    def _queue_metrics(self):
+        yield ("bot_webhook_queue_depth", "gauge", "Апдейты в очереди вебхука", [({}, self.queue.qsize())])
+        yield ("bot_webhook_queue_capacity", "gauge", "Размер очереди вебхука", [({}, self.queue.maxsize)])
+        yield ("bot_webhook_in_flight", "gauge", "Апдейты вебхука в обработке", [({}, len(self._in_flight))])
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        add_health_routes(app, self.monitor)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        header = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(header, self.secret):
+            WEBHOOK_UPDATES.inc(result="forbidden")
+            return web.Response(status=403)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            # Повтор от Telegram не поможет - подтверждаем и пропускаем
+            WEBHOOK_UPDATES.inc(result="invalid")
+            logger.error(f"❌ Некорректный апдейт на вебхуке: {e}")
+            return web.Response()
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            WEBHOOK_UPDATES.inc(result="queue_full")
+            return web.Response(status=503)
+
+        WEBHOOK_UPDATES.inc(result="accepted")
+        return web.Response()
+
+    async def _dispatch(self):
+        while True:
+            # Слот берем до апдейта: пока все заняты, апдейты ждут в очереди
+            # и видны в ее глубине
+            await self._slots.acquire()
+            update = await self.queue.get()
+            task = asyncio.create_task(self._process(update))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки апдейта {update.update_id}: {e}")
+        finally:
+            self._slots.release()
+            self.queue.task_done()
+
+    async def start(self, url: str, port: int = None):
+        """Поднимаем HTTP-сервер, разбор очереди и регистрируем вебхук в Telegram"""
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._runner = await start_http_server(self.app(), port)
+
+        # Как skip_updates=True в polling: накопленные за простой апдейты не обрабатываем
+        await self.bot.set_webhook(
+            url.rstrip("/") + self.path,
+            secret_token=self.secret,
+            allowed_updates=self.dp.resolve_used_update_types(),
+            drop_pending_updates=True,
+        )
+        logger.info("✅ Вебхук зарегистрирован")
+
+    async def stop(self, drain_timeout: float = 10):
+        """Перестаем принимать апдейты и дообрабатываем очередь вместе с
+        апдейтами, которые уже в обработке.
+
+        Вебхук в Telegram не удаляем: при перезапуске новый экземпляр
+        переустановит его сам.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Не дообработано апдейтов: {self.queue.qsize() + len(self._in_flight)}")
+        tasks = [*self._in_flight]
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)